@@ -0,0 +1,87 @@
+import os
+import sys
+import time
+import tracemalloc
+
+# Память и время создания 100 000 карт: старая карта с __dict__ против новых вариантов
+# Запуск: python benchmarks/card_memory.py [количество]
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from card_store import CardStore
+from cult_rules import CardData
+from piepiee import Card, RED, GREEN, PURPLE, ORANGE, BLUE, GOLD
+
+class OldCard:
+    """Карта в прежнем виде: __dict__ и два словаря на каждый экземпляр"""
+    def __init__(self, title, description, card_type, value=None, x=None, y=None):
+        self.title = title
+        self.description = description
+        self.type = card_type
+        self.value = value
+        self.x = x
+        self.y = y
+        self.dragging = False
+        self.hovered = False
+        self.z_index = 0
+        self.border_colors = {
+            'aspect': RED,
+            'follower': GREEN,
+            'location': PURPLE,
+            'lore': ORANGE,
+            'resource': BLUE,
+            'cult': GOLD
+        }
+        self.border_color = self.border_colors.get(card_type, GOLD)
+        self.border_width = 3 if card_type == 'cult' else 2
+        self.emojis = {
+            'aspect': '🔮',
+            'follower': '👤',
+            'location': '🏛️',
+            'lore': '📖',
+            'resource': '💰',
+            'cult': '☪️'
+        }
+        self.emoji = self.emojis.get(card_type, '❓')
+
+KINDS = [
+    ("Видение", "Образ из снов", 'aspect'),
+    ("Заброшенный храм", "Место, полное тайн", 'location'),
+    ("Последователь", "Член вашего культа", 'follower'),
+    ("Древнее знание", "Запретные знания предков", 'lore'),
+]
+
+def measure(name, make, count):
+    tracemalloc.start()
+    start = time.perf_counter()
+    cards = make(count)
+    elapsed = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:28} {size / 2 ** 20:8.1f} МБ {size / count:8.0f} байт/карта {elapsed * 1000:8.0f} мс")
+    del cards
+    return size
+
+def make_objects(card_class):
+    def make(count):
+        return [card_class(*KINDS[i % len(KINDS)], None, i % 480, i % 330) for i in range(count)]
+    return make
+
+def make_store(count):
+    store = CardStore()
+    for i in range(count):
+        store.add(*KINDS[i % len(KINDS)], None, i % 480, i % 330)
+    return store
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    print(f"{count} карт")
+    before = measure("Card до (__dict__)", make_objects(OldCard), count)
+    after = measure("Card (__slots__)", make_objects(Card), count)
+    measure("CardData (__slots__)", make_objects(CardData), count)
+    store = measure("CardStore (массивы)", make_store, count)
+    print(f"Card: в {before / after:.1f} раза меньше памяти, CardStore: в {before / store:.1f} раза")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+import argparse
+import itertools
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+# Замеры производительности без окна (драйвер SDL dummy): отрисовка кадра с
+# разным числом карт, карты по отдельности, перенос текста, ходы правил, поиск
+# карты под курсором, перетаскивание и рестарт игры.
+#
+# Запуск:          python benchmarks/run_benchmarks.py [-k подстрока]
+# Новая база:      python benchmarks/run_benchmarks.py --save
+# Результаты сравниваются с benchmarks/baseline.json: если медиана замера хуже
+# базы больше чем на --threshold (по умолчанию 25%), скрипт завершается с кодом 1.
+# База зависит от машины, поэтому после смены машины ее нужно записать заново.
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pygame
+
+from cult_rules import CultRules
+from piepiee import CultGame, Card, DirtyRenderer, coalesce_motion, CARD_WIDTH, CARD_HEIGHT, PANEL_WIDTH, SCREEN_WIDTH, SCREEN_HEIGHT
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+KINDS = [
+    ("Видение", "Образ из снов", 'aspect'),
+    ("Заброшенный храм", "Место, полное тайн", 'location'),
+    ("Последователь", "Член вашего культа", 'follower'),
+    ("Древнее знание", "Запретные знания предков", 'lore'),
+]
+
+BENCHMARKS = []
+
+def benchmark(name, number=1):
+    """Регистрирует замер: setup() -> функция одного вызова, number вызовов в раунде"""
+    def register(setup):
+        BENCHMARKS.append((name, setup, number))
+        return setup
+    return register
+
+def make_game(cards, seed=1):
+    """Игра без сохранения на экране партии с cards отдельными картами (без стопок)"""
+    game = CultGame(seed=seed, save_path=None, log_dir=None)
+    game.game_state = "game"
+    for i in range(max(0, cards - len(game.cards))):
+        game.create_card(*KINDS[i % len(KINDS)], stack=False)
+    return game
+
+def mouse_path(count, seed=2):
+    rng = random.Random(seed)
+    return [(rng.randint(0, SCREEN_WIDTH - PANEL_WIDTH), rng.randint(70, SCREEN_HEIGHT - 110)) for _ in range(count)]
+
+# Отрисовка кадра
+
+def frame_benchmark(cards):
+    def setup():
+        game = make_game(cards)
+        def frame():
+            game.draw_game()
+            pygame.display.flip()
+        return frame
+    return setup
+
+for count in (5, 50, 500, 5000):
+    benchmark(f"frame_{count}_cards")(frame_benchmark(count))
+
+@benchmark("frame_500_cards_dirty_rects", number=10)
+def frame_dirty():
+    # Кадр без изменений: перерисовывать нечего
+    game = make_game(500)
+    game.dirty_rects = True
+    game.renderer = DirtyRenderer(game)
+    game.draw_frame()
+    return game.draw_frame
+
+# Карты
+
+@benchmark("card_draw_cached", number=1000)
+def card_draw():
+    game = make_game(5)
+    card = game.cards[-1]
+    card.draw(game.screen, game.small_font)
+    return lambda: card.draw(game.screen, game.small_font)
+
+@benchmark("card_render_uncached", number=100)
+def card_render():
+    game = make_game(5)
+    card = game.cards[-1]
+    return lambda: card.render(game.small_font, CARD_WIDTH, CARD_HEIGHT)
+
+@benchmark("card_wrap_text", number=1000)
+def card_wrap_text():
+    game = make_game(5)
+    card = Card("Таинственный незнакомец", "Проявил интерес к оккультному и хочет узнать больше", 'follower')
+    return lambda: card.wrap_text(card.description, game.small_font, CARD_WIDTH - 20)
+
+# Правила
+
+def actions_benchmark(make):
+    def setup():
+        rng = random.Random(3)
+        state = {"game": make()}
+        def actions():
+            # 100 ходов подряд, после концовки - новая партия
+            for _ in range(100):
+                game = state["game"]
+                game.perform_action(rng.choice(game.available_actions()))
+                if game.game_state == "ending":
+                    state["game"] = make()
+        return actions
+    return setup
+
+benchmark("rules_100_actions")(actions_benchmark(lambda: CultRules(random.Random(4))))
+benchmark("game_100_actions")(actions_benchmark(lambda: make_game(0, seed=4)))
+
+# Поиск карты под курсором и перетаскивание
+
+@benchmark("hover_5000_cards", number=1000)
+def hover():
+    game = make_game(5000)
+    positions = itertools.cycle(mouse_path(1000))
+    return lambda: game.update_card_hover(next(positions))
+
+@benchmark("frame_50_cards_hover_sweep", number=10)
+def hover_sweep():
+    # Кадр, в котором подсветка переходит на следующую карту
+    game = make_game(50)
+    positions = itertools.cycle([(card.x + 5, card.y + 5) for card in game.cards])
+    def frame():
+        game.update_card_hover(next(positions))
+        game.draw_game()
+        pygame.display.flip()
+    return frame
+
+@benchmark("drag_500_cards_100_moves")
+def drag():
+    # Цикл run при перетаскивании: события движения мыши плюс подсветка
+    game = make_game(500)
+    game.dragged_card = None
+    game.drag_offset = (0, 0)
+    card = game.cards[-1]
+    press = pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=(card.x + 5, card.y + 5), button=1)
+    moves = [pygame.event.Event(pygame.MOUSEMOTION, pos=pos) for pos in mouse_path(100)]
+    release = pygame.event.Event(pygame.MOUSEBUTTONUP, pos=(0, 0), button=1)
+    def drag_moves():
+        game.handle_event(press)
+        for event in moves:
+            game.handle_event(event)
+            game.update_card_hover(event.pos)
+        game.handle_event(release)
+    return drag_moves
+
+@benchmark("drag_frame_1000_motions")
+def drag_frame():
+    # Кадр с мышью высокой частоты опроса: 1000 движений в очереди сливаются в одно
+    game = make_game(5000)
+    card = game.cards[-1]
+    game.handle_event(pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=(card.x + 5, card.y + 5), button=1))
+    moves = [pygame.event.Event(pygame.MOUSEMOTION, pos=pos) for pos in mouse_path(1000)]
+    def frame():
+        for event in coalesce_motion(moves):
+            game.handle_event(event)
+        game.update_card_hover(moves[-1].pos)
+    return frame
+
+# Рестарт
+
+@benchmark("restart")
+def restart():
+    game = make_game(50)
+    return lambda: game.reset(seed=5)
+
+def measure(setup, number, rounds, min_time):
+    """Медиана времени одного вызова в микросекундах"""
+    fn = setup()
+    fn()  # прогрев
+    times = []
+    start = time.perf_counter()
+    while len(times) < rounds or time.perf_counter() - start < min_time:
+        begin = time.perf_counter_ns()
+        for _ in range(number):
+            fn()
+        times.append((time.perf_counter_ns() - begin) / number / 1000)
+        if len(times) >= rounds * 20:
+            break
+    return statistics.median(times), min(times), len(times)
+
+def main():
+    parser = argparse.ArgumentParser(description="Замеры производительности")
+    parser.add_argument("-k", dest="filter", default="", help="только замеры с этой подстрокой в имени")
+    parser.add_argument("--rounds", type=int, default=15)
+    parser.add_argument("--min-time", type=float, default=0.3, help="минимум секунд на замер")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--threshold", type=float, default=0.25, help="допустимое замедление (0.25 = 25%%)")
+    parser.add_argument("--save", action="store_true", help="записать результаты как новую базу")
+    args = parser.parse_args()
+    
+    try:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        baseline = {}
+    
+    results = {}
+    regressions = []
+    for name, setup, number in BENCHMARKS:
+        if args.filter not in name:
+            continue
+        median, best, rounds = measure(setup, number, args.rounds, args.min_time)
+        results[name] = round(median, 2)
+        line = f"{name:32} {median:12.1f} мкс (лучший {best:.1f}, раундов {rounds})"
+        base = baseline.get(name)
+        if base:
+            change = median / base - 1
+            line += f"  {change:+7.1%} к базе"
+            if change > args.threshold:
+                regressions.append(name)
+                line += "  МЕДЛЕННЕЕ"
+        print(line, flush=True)
+    pygame.quit()
+    
+    if args.save:
+        baseline.update(results)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(dict(sorted(baseline.items())), f, indent=2)
+            f.write("\n")
+        print(f"База записана в {args.baseline}")
+    elif regressions:
+        print(f"Замедление больше {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+from array import array
+
+from cult_rules import CARD_TYPES, CardData
+
+# Хранилище карт "структурой массивов": для очень больших столов, где объект
+# на каждую карту слишком дорог. Координаты, типы и значения лежат в array,
+# строки (названия и описания) хранятся один раз в общей таблице.
+
+NO_VALUE = -2 ** 31  # карта без значения (value=None)
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+class CardStore:
+    """Карты в параллельных массивах, карта - это индекс"""
+    def __init__(self):
+        self.x = array('h')
+        self.y = array('h')
+        self.z_index = array('i')
+        self.types = array('b')
+        self.values = array('i')
+        self.titles = array('H')
+        self.descriptions = array('H')
+        
+        # Общая таблица строк
+        self.strings = []
+        self.string_ids = {}
+    
+    def __len__(self):
+        return len(self.types)
+    
+    def intern(self, text):
+        string_id = self.string_ids.get(text)
+        if string_id is None:
+            string_id = len(self.strings)
+            self.strings.append(text)
+            self.string_ids[text] = string_id
+        return string_id
+    
+    def add(self, title, description, card_type, value=None, x=0, y=0, z_index=0):
+        """Добавляет карту и возвращает ее индекс"""
+        self.x.append(x)
+        self.y.append(y)
+        self.z_index.append(z_index)
+        self.types.append(CARD_TYPES.index(card_type))
+        self.values.append(NO_VALUE if value is None else value)
+        self.titles.append(self.intern(title))
+        self.descriptions.append(self.intern(description))
+        return len(self.types) - 1
+    
+    def remove(self, index):
+        # Последняя карта переезжает на место удаленной, индекс последней меняется
+        for column in (self.x, self.y, self.z_index, self.types, self.values, self.titles, self.descriptions):
+            column[index] = column[-1]
+            column.pop()
+    
+    def move(self, index, x, y):
+        self.x[index] = x
+        self.y[index] = y
+    
+    def get(self, index):
+        """Карта по индексу в виде обычного объекта"""
+        value = self.values[index]
+        card = CardData(self.strings[self.titles[index]], self.strings[self.descriptions[index]],
+                        CARD_TYPES[self.types[index]], None if value == NO_VALUE else value,
+                        self.x[index], self.y[index])
+        card.z_index = self.z_index[index]
+        return card
+    
+    def count(self, card_type):
+        return self.types.count(CARD_TYPES.index(card_type))
+    
+    def as_numpy(self):
+        """Столбцы как массивы NumPy без копирования (если NumPy установлен)"""
+        if np is None:
+            raise RuntimeError("Для as_numpy нужен NumPy")
+        return {
+            'x': np.frombuffer(self.x, dtype=np.int16),
+            'y': np.frombuffer(self.y, dtype=np.int16),
+            'z_index': np.frombuffer(self.z_index, dtype=np.int32),
+            'types': np.frombuffer(self.types, dtype=np.int8),
+            'values': np.frombuffer(self.values, dtype=np.int32),
+        }
+    
+    @classmethod
+    def from_cards(cls, cards):
+        store = cls()
+        for card in cards:
+            store.add(card.title, card.description, card.type, card.value, card.x, card.y, card.z_index)
+        return store
@@ -0,0 +1,192 @@
+import argparse
+import time
+
+import numpy as np
+
+from cult_rules import ACTIONS
+
+# Пакетный симулятор: N партий хранятся массивами NumPy и делают ход одновременно.
+# Ветки CultRules.perform_action повторены масками, поэтому при изменении правил
+# их нужно править в обоих местах.
+
+WORK, STUDY, DREAM, TALK, EXPLORE, REST, RITUAL, CREATE_CULT = range(len(ACTIONS))
+
+# Коды концовок (0 - партия не закончилась за max_turns)
+ENDING_CODES = ["NONE", "ASCENSION", "MADNESS", "CULT_LEADER", "FORGOTTEN"]
+NONE, ASCENSION, MADNESS, CULT_LEADER, FORGOTTEN = range(len(ENDING_CODES))
+
+class BatchState:
+    """Состояние N партий: ресурсы и количество карт по типам"""
+    def __init__(self, n):
+        # Здоровье, рассудок и аспекты не выходят за 10, остальное растет со временем
+        self.health = np.full(n, 10, dtype=np.int8)
+        self.reason = np.full(n, 10, dtype=np.int8)
+        self.aspect = np.zeros(n, dtype=np.int8)
+        self.funds = np.full(n, 5, dtype=np.int16)
+        self.cult = np.zeros(n, dtype=bool)
+        # Начальные карты: "Старая книга" и "Таинственный незнакомец"
+        self.lore = np.ones(n, dtype=np.int16)
+        self.ancient = np.zeros(n, dtype=np.int16)  # карты "Древнее знание"
+        self.follower = np.ones(n, dtype=np.int16)
+        self.location = np.zeros(n, dtype=np.int16)
+    
+    def __len__(self):
+        return len(self.health)
+    
+    def keep(self, mask):
+        # Оставляет только партии, которые еще идут
+        for name, array in vars(self).items():
+            setattr(self, name, array[mask])
+    
+    def can_create_cult(self):
+        return (self.ancient > 0) & (self.follower > 0) & ~self.cult
+
+def as_int(mask):
+    # bool -> 0/1 без копирования
+    return mask.view(np.int8)
+
+def random_policy(state, rng):
+    """Случайное действие среди видимых кнопок"""
+    extra = state.cult | state.can_create_cult()
+    actions = (rng.random(len(state), dtype=np.float32) * (6 + as_int(extra))).astype(np.int8)
+    # Седьмая кнопка - "Ритуал" после создания культа, иначе "Создать культ"
+    actions += as_int((actions == RITUAL) & ~state.cult)
+    return actions
+
+def step(state, actions, u):
+    """Один ход каждой партии. Возвращает коды концовок (NONE - игра продолжается)"""
+    # Все ветки считаются арифметикой по маскам: индексация по маске в NumPy
+    # намного медленнее, чем лишний проход по массиву
+    
+    # Работать
+    ok = (actions == WORK) & (state.health > 2)
+    state.funds += 2 * as_int(ok)
+    state.health -= as_int(ok)
+    state.follower += as_int(ok & (u > 0.8))
+    
+    # Изучать
+    ok = (actions == STUDY) & (state.reason > 1) & (state.lore > 0)
+    state.reason -= as_int(ok)
+    ok &= u > 0.7
+    state.lore += as_int(ok)
+    state.ancient += as_int(ok)
+    
+    # Сны
+    ok = (actions == DREAM) & (state.reason > 0)
+    state.reason -= as_int(ok)
+    state.aspect += as_int(ok & (u > 0.7))
+    
+    # Беседовать
+    state.follower += as_int((actions == TALK) & (u > 0.5))
+    
+    # Исследовать
+    ok = (actions == EXPLORE) & (state.funds > 0)
+    state.funds -= as_int(ok)
+    state.location += as_int(ok & (u > 0.6))
+    
+    # Отдых: +2 здоровья и +1 рассудка, но не выше 10
+    ok = (actions == REST) & (state.funds > 0)
+    state.funds -= as_int(ok)
+    state.health += as_int(ok & (state.health < 10)) + as_int(ok & (state.health < 9))
+    state.reason += as_int(ok & (state.reason < 10))
+    
+    # Ритуал: сначала проверка концовок в порядке perform_ritual_check
+    ritual = (actions == RITUAL) & state.cult
+    ascension = (state.lore >= 3) & (state.follower >= 2)
+    madness = ~ascension & (state.aspect >= 5)
+    leader = ~ascension & ~madness & (state.follower >= 5)
+    forgotten = ~ascension & ~madness & ~leader & (state.location >= 3)
+    ritual_ending = ritual & (ascension | madness | leader | forgotten)
+    
+    # Обычный ритуал, если концовки нет
+    ok = ritual & ~ritual_ending & (state.health > 1) & (state.reason > 1)
+    state.health -= as_int(ok)
+    state.reason -= as_int(ok)
+    state.lore += as_int(ok & (u > 0.8))
+    
+    # Создать культ
+    state.cult |= (actions == CREATE_CULT) & state.can_create_cult()
+    
+    # Автоматические концовки (после ритуала с концовкой не проверяются)
+    auto_madness = (state.reason <= 0) | ((state.health > 0) & (state.aspect >= 7))
+    auto_forgotten = (state.reason > 0) & (state.health <= 0)
+    
+    ending = ASCENSION * as_int(ritual_ending & ascension)
+    ending += MADNESS * as_int(ritual_ending & madness | ~ritual_ending & auto_madness)
+    ending += CULT_LEADER * as_int(ritual_ending & leader)
+    ending += FORGOTTEN * as_int(ritual_ending & forgotten | ~ritual_ending & auto_forgotten)
+    return ending
+
+class BatchResult:
+    """Распределение концовок и длительности партий"""
+    def __init__(self, max_turns):
+        self.endings = np.zeros(len(ENDING_CODES), dtype=np.int64)
+        # turns[e][t] - сколько партий закончилось концовкой e на ходу t
+        self.turns = np.zeros((len(ENDING_CODES), max_turns + 1), dtype=np.int64)
+    
+    @property
+    def games(self):
+        return int(self.endings.sum())
+    
+    def ending_counts(self):
+        return {name: int(count) for name, count in zip(ENDING_CODES, self.endings)}
+    
+    def turn_histogram(self, ending=None):
+        """Гистограмма длительности партий (все концовки или одна)"""
+        if ending is None:
+            return self.turns.sum(axis=0)
+        return self.turns[ENDING_CODES.index(ending)]
+    
+    def mean_turns(self):
+        histogram = self.turn_histogram()
+        return float((histogram * np.arange(len(histogram))).sum() / max(1, histogram.sum()))
+
+def simulate(games, policy=random_policy, seed=None, max_turns=500, chunk=262144):
+    """Прогоняет games партий и возвращает BatchResult"""
+    rng = np.random.default_rng(seed)
+    result = BatchResult(max_turns)
+    
+    for start in range(0, games, chunk):
+        state = BatchState(min(chunk, games - start))
+        # Закончившиеся партии выбрасываются из массивов не каждый ход,
+        # а когда их накопится четверть, до этого их ходы просто игнорируются
+        alive = np.ones(len(state), dtype=bool)
+        left = len(state)
+        for turn in range(1, max_turns + 1):
+            actions = policy(state, rng)
+            ending = step(state, actions, rng.random(len(state), dtype=np.float32))
+            ending *= as_int(alive)
+            counts = np.array([0] + [np.count_nonzero(ending == code) for code in range(1, len(ENDING_CODES))])
+            result.endings += counts
+            result.turns[:, turn] += counts
+            left -= int(counts.sum())
+            if not left:
+                break
+            alive &= ending == NONE
+            if left < len(state) * 3 // 4:
+                state.keep(alive)
+                alive = np.ones(left, dtype=bool)
+        # Не закончились за max_turns
+        result.endings[NONE] += left
+        result.turns[NONE, max_turns] += left
+    
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Пакетная симуляция концовок")
+    parser.add_argument("games", type=int, nargs="?", default=1000000)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--max-turns", type=int, default=500)
+    args = parser.parse_args()
+    
+    start = time.perf_counter()
+    result = simulate(args.games, seed=args.seed, max_turns=args.max_turns)
+    elapsed = time.perf_counter() - start
+    
+    for name, count in result.ending_counts().items():
+        print(f"{name:12} {count:10} {count / result.games:7.2%}")
+    print(f"Средняя длина партии: {result.mean_turns():.1f} ходов")
+    print(f"{result.games} партий за {elapsed:.2f} с")
+
+if __name__ == "__main__":
+    main()
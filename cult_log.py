@@ -0,0 +1,149 @@
+import gzip
+import json
+import os
+import re
+from bisect import bisect_right
+from collections import deque
+
+# Вся история журнала событий: сколько бы дней ни шла игра, память не растет.
+#
+# Последние записи лежат в кольцевом буфере (deque) вместе с готовой картинкой
+# строки, которую заполняет и хранит вызывающий - каждая запись рисуется один
+# раз. Все записи пачками по batch дописываются в сжатые файлы
+# directory/log.<номер первой записи>.jsonl.gz. Каждая пачка - отдельный член
+# gzip (файл из нескольких членов читается как один поток), после file_size
+# байт начинается новый файл, файлы сверх files удаляются, начиная со старых.
+#
+# Чтение страницы (page) разжимает только файл, в котором лежат нужные записи,
+# и только до них, поэтому прокрутка назад не загружает всю историю.
+
+RECENT = 200  # записей в памяти
+BATCH = 64  # записей в одной пачке на диск
+FILE_SIZE = 256 * 1024  # байт сжатого файла, после которых начинается новый
+FILES = 64  # сжатых файлов на диске
+
+FILE_NAME = re.compile(r'log\.(\d+)\.jsonl\.gz')
+
+class EventLog:
+    """Журнал событий: последние записи в памяти, вся история в сжатых файлах"""
+    def __init__(self, directory=None, recent=RECENT, batch=BATCH, file_size=FILE_SIZE, files=FILES):
+        self.directory = directory
+        # Буфер не меньше пачки: все, что еще не на диске, есть в памяти
+        self.recent = deque(maxlen=max(recent, batch))  # [текст, картинка или None]
+        self.pending = []  # тексты, еще не записанные на диск
+        self.batch = batch
+        self.file_size = file_size
+        self.max_files = files
+        self.files = []  # номера первых записей файлов по возрастанию
+        self.count = 0  # всего записей
+        self.rotate = False  # начать новый файл при следующей записи
+        self.older = (None, [])  # последняя прочитанная страница старых записей
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self.files = sorted(int(match.group(1)) for match in map(FILE_NAME.fullmatch, os.listdir(directory)) if match)
+            if self.files:
+                # Продолжаем нумерацию после записей прошлого запуска
+                lines, complete = self.scan(self.files[-1])
+                self.count = self.files[-1] + lines
+                # Недописанную пачку в конце файла нельзя продолжать: за ней записи не прочитаются
+                self.rotate = not complete
+    
+    def __len__(self):
+        return self.count
+    
+    def path(self, first):
+        return os.path.join(self.directory, f"log.{first:012d}.jsonl.gz")
+    
+    def start(self):
+        """Номер самой старой записи, которую еще можно прочитать"""
+        if self.files:
+            return self.files[0]
+        return self.count - len(self.recent)
+    
+    # Запись
+    
+    def append(self, text):
+        self.recent.append([text, None])
+        self.count += 1
+        if self.directory:
+            self.pending.append(text)
+            if len(self.pending) >= self.batch:
+                self.flush()
+    
+    def extend(self, texts):
+        for text in texts:
+            self.append(text)
+    
+    def flush(self):
+        """Дописывает накопленные записи на диск одним членом gzip"""
+        if not self.pending:
+            return
+        if not self.files or self.rotate or os.path.getsize(self.path(self.files[-1])) >= self.file_size:
+            self.files.append(self.count - len(self.pending))
+            self.rotate = False
+            while len(self.files) > self.max_files:
+                os.remove(self.path(self.files.pop(0)))
+        data = ''.join(json.dumps(text, ensure_ascii=False) + '\n' for text in self.pending)
+        with open(self.path(self.files[-1]), 'ab') as f:
+            f.write(gzip.compress(data.encode('utf-8')))
+        self.pending = []
+    
+    def close(self):
+        if self.directory:
+            self.flush()
+    
+    # Чтение
+    
+    def scan(self, first):
+        # Число записей в файле и дописан ли он до конца
+        lines = 0
+        try:
+            with gzip.open(self.path(first), 'rt', encoding='utf-8') as f:
+                for _ in f:
+                    lines += 1
+        except (OSError, EOFError):
+            return lines, False
+        return lines, True
+    
+    def read_file(self, first):
+        try:
+            with gzip.open(self.path(first), 'rt', encoding='utf-8') as f:
+                for line in f:
+                    yield json.loads(line)
+        except (OSError, EOFError, ValueError):
+            # Недописанная пачка (программа упала во время записи): дальше читать нечего
+            return
+    
+    def page(self, start, count):
+        """Тексты записей start..start+count-1 (из тех, что еще доступны)"""
+        end = min(start + count, self.count)
+        start = max(start, self.start())
+        recent_first = self.count - len(self.recent)
+        texts = []
+        if start < recent_first:
+            # Со старых файлов: только файл с записью start и следующие, пока страница не наберется
+            disk_end = min(end, recent_first)
+            for first in self.files[bisect_right(self.files, start) - 1:]:
+                if first >= disk_end:
+                    break
+                for index, text in enumerate(self.read_file(first), first):
+                    if index >= disk_end:
+                        break
+                    if index >= start:
+                        texts.append(text)
+            start = recent_first
+        texts.extend(self.recent[index - recent_first][0] for index in range(start, end))
+        return texts
+    
+    def entries(self, start, count):
+        """Записи start..start+count-1 как списки [текст, картинка]; картинку заполняет вызывающий"""
+        # Страница, начало которой уже недоступно, сдвигается к самой старой записи
+        start = max(start, self.start())
+        end = min(start + count, self.count)
+        recent_first = self.count - len(self.recent)
+        if start >= recent_first:
+            return [self.recent[index - recent_first] for index in range(start, end)]
+        # Страница старых записей читается с диска один раз, пока ее показывают
+        if self.older[0] != (start, end):
+            self.older = ((start, end), [[text, None] for text in self.page(start, end - start)])
+        return self.older[1]
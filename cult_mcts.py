@@ -0,0 +1,265 @@
+import argparse
+import math
+import random
+import time
+from collections import deque
+
+from cult_rules import ENDINGS, LOG_SIZE, CardData, CultRules
+
+# Автоигрок: поиск Монте-Карло по дереву (MCTS) к выбранной концовке.
+#
+# Ходы считаются на RolloutState - тех же правилах CultRules, но clone() копирует
+# только числа, а списки карт, индексы и журнал делит с оригиналом. Свои копии
+# карт клон делает перед первым изменением карт (copy-on-write), журнал событий
+# вообще не меняется на месте. Поэтому клон стоит микросекунды, и на ход успевают
+# сотни симуляций.
+#
+# Исход действий случаен, поэтому дерево "открытое": узел - последовательность
+# действий от корня, а состояние в каждой симуляции разыгрывается заново из клона
+# корня. Награда - GAMMA в степени числа ходов до нужной концовки (0, если
+# партия кончилась иначе или не кончилась за HORIZON ходов), то есть поиск
+# ищет самый быстрый путь.
+#
+# Оценка без окна:   python cult_mcts.py --ending ASCENSION --games 20
+# Показ в игре:      python cult_mcts.py --ending CULT_LEADER --demo
+# Нагрузочный прогон настоящей игры с проверкой состояния:  --soak --games 100
+
+BUDGET = 0.05  # секунд на выбор хода
+HORIZON = 60  # ходов в симуляции от корня
+GAMMA = 0.97  # награда за концовку через n ходов - GAMMA ** n
+EXPLORATION = 0.5  # коэффициент исследования в UCB1
+MAX_TURNS = 500  # ходов в партии до признания ее незаконченной
+
+# Поля CultRules, из которых состоит партия (без графики, журнала сохранения и rng)
+STATE_FIELDS = ('health', 'reason', 'funds', 'cards', 'next_uid', 'card_order', 'top_z', 'card_index',
+                'type_counts', 'ancient_knowledge', 'log_entries', 'cult_created', 'has_ancient_knowledge',
+                'has_first_follower', 'endings', 'game_state', 'current_ending')
+
+class RolloutState(CultRules):
+    """Партия для поиска: правила CultRules и дешевый clone()"""
+    @classmethod
+    def from_game(cls, game, rng=None):
+        # Карты и индексы игры не копируются: до первого изменения они общие
+        state = cls.__new__(cls)
+        state.__dict__.update({name: getattr(game, name) for name in STATE_FIELDS})
+        state.rng = rng if rng is not None else random.Random()
+        state.journal = None
+        state.shared = True
+        state.copies = {}
+        return state
+    
+    def clone(self):
+        state = RolloutState.__new__(RolloutState)
+        state.__dict__ = self.__dict__.copy()
+        # После клонирования карты общие у обоих: менять их на месте нельзя ни тому, ни другому
+        self.shared = state.shared = True
+        return state
+    
+    def own(self):
+        # Первое изменение карт после clone: свои копии карт, индекса и счетчиков по типам
+        copies = {}
+        for card in self.cards:
+            copy = copies[card.uid] = CardData(card.title, card.description, card.type, card.value, card.x, card.y)
+            copy.uid = card.uid
+            copy.z_index = card.z_index
+            copy.order = card.order
+            copy.count = card.count
+        self.cards = list(copies.values())
+        self.card_index = {key: [copies[card.uid] for card in cards] for key, cards in self.card_index.items()}
+        self.type_counts = dict(self.type_counts)
+        self.copies = copies
+        self.shared = False
+    
+    def local(self, card):
+        # Своя копия карты, если card взята из общих списков
+        if self.shared:
+            self.own()
+        return self.copies.get(card.uid, card)
+    
+    def create_card(self, title, desc, card_type, value=None, x=None, y=None, stack=True):
+        if self.shared:
+            self.own()
+        return CultRules.create_card(self, title, desc, card_type, value, x, y, stack)
+    
+    def set_card_count(self, card, count):
+        CultRules.set_card_count(self, self.local(card), count)
+    
+    def remove_card(self, card):
+        CultRules.remove_card(self, self.local(card))
+    
+    def rename_card(self, card, title, description):
+        CultRules.rename_card(self, self.local(card), title, description)
+    
+    def update_resources(self):
+        # Значения на картах ресурсов нужны только для отрисовки, правила берут self.health и т.д.
+        pass
+    
+    def add_log(self, text):
+        # Новый буфер вместо изменения общего
+        self.log_entries = deque(self.log_entries, LOG_SIZE)
+        self.log_entries.append(text)
+
+class Node:
+    """Узел открытого дерева: действие -> узел, число симуляций и сумма наград"""
+    __slots__ = ('children', 'visits', 'value')
+    
+    def __init__(self):
+        self.children = {}
+        self.visits = 0
+        self.value = 0.0
+
+class MCTSPlayer:
+    """Выбирает ход к концовке target за budget секунд"""
+    def __init__(self, target, budget=BUDGET, horizon=HORIZON, exploration=EXPLORATION, seed=None):
+        if target not in ENDINGS:
+            raise ValueError(f"Неизвестная концовка: {target}")
+        self.target = target
+        self.budget = budget
+        self.horizon = horizon
+        self.exploration = exploration
+        self.rng = random.Random(seed)
+        self.simulations = 0  # симуляций на последнем ходе
+    
+    def choose(self, game):
+        root_state = RolloutState.from_game(game, self.rng)
+        actions = root_state.available_actions()
+        if len(actions) == 1:
+            return actions[0]
+        root = Node()
+        deadline = time.perf_counter() + self.budget
+        simulations = 0
+        while simulations < len(actions) or time.perf_counter() < deadline:
+            self.simulate(root, root_state.clone())
+            simulations += 1
+        self.simulations = simulations
+        return max(root.children.items(), key=lambda item: item[1].visits)[0]
+    
+    def simulate(self, node, state):
+        path = [node]
+        depth = 0
+        # Спуск по дереву: UCB1 среди действий, доступных в разыгранном состоянии
+        while state.game_state == "game" and depth < self.horizon:
+            actions = state.available_actions()
+            untried = [action for action in actions if action not in node.children]
+            if untried:
+                action = self.rng.choice(untried)
+                node.children[action] = node = Node()
+            else:
+                log_visits = math.log(node.visits)
+                action = max(actions, key=lambda action: self.ucb(node.children[action], log_visits))
+                node = node.children[action]
+            state.perform_action(action)
+            path.append(node)
+            depth += 1
+            if untried:
+                break
+        
+        reward = self.rollout(state, depth)
+        for node in path:
+            node.visits += 1
+            node.value += reward
+    
+    def ucb(self, node, log_visits):
+        return node.value / node.visits + self.exploration * math.sqrt(log_visits / node.visits)
+    
+    def rollout(self, state, depth):
+        # Случайные видимые кнопки до концовки или горизонта
+        choice = self.rng.choice
+        while state.game_state == "game" and depth < self.horizon:
+            state.perform_action(choice(state.available_actions()))
+            depth += 1
+        if state.game_state == "ending" and state.current_ending == self.target:
+            return GAMMA ** depth
+        return 0.0
+
+def play(player, seed, max_turns=MAX_TURNS):
+    """Партия без окна: (концовка или NONE, число ходов)"""
+    game = CultRules(random.Random(seed))
+    for turn in range(1, max_turns + 1):
+        game.perform_action(player.choose(game))
+        if game.game_state == "ending":
+            return game.current_ending, turn
+    return "NONE", max_turns
+
+def check_game(game):
+    """Расхождения индексов и представления настоящей игры (для --soak)"""
+    problems = []
+    counts = {}
+    for card in game.cards:
+        counts[card.type] = counts.get(card.type, 0) + card.count
+        if card not in game.card_index.get((card.type, card.title), ()):
+            problems.append(f"карты {card.uid} нет в индексе")
+    if counts != {card_type: count for card_type, count in game.type_counts.items() if count}:
+        problems.append(f"счетчики типов {game.type_counts} вместо {counts}")
+    if set(game.z_order) != set(game.cards):
+        problems.append("z_order не совпадает с картами")
+    for title, value in (("Здоровье", game.health), ("Рассудок", game.reason), ("Деньги", game.funds)):
+        for card in game.find_cards('resource', title):
+            if card.value != value:
+                problems.append(f"карта \"{title}\" показывает {card.value} вместо {value}")
+    return problems
+
+def drive_ui(player, games, seed, delay, soak):
+    """Играет в настоящем окне CultGame через perform_action"""
+    import pygame
+    from piepiee import CultGame
+    
+    game = CultGame(seed=seed, save_path=None, log_dir=None)
+    game.game_state = "game"
+    results = []
+    turns = 0
+    start = time.perf_counter()
+    while not games or len(results) < games:
+        if any(event.type == pygame.QUIT for event in pygame.event.get()):
+            break
+        if game.game_state == "game":
+            game.perform_action(player.choose(game))
+            turns += 1
+            problems = check_game(game) if soak else []
+            if problems:
+                raise RuntimeError(f"партия seed={game.seed}, ход {turns}: " + "; ".join(problems))
+        game.draw_frame()
+        if game.game_state == "ending" or turns >= MAX_TURNS:
+            ending = game.current_ending if game.game_state == "ending" else "NONE"
+            results.append((ending, turns))
+            print(f"seed {game.seed}: {ending} за {turns} ходов")
+            if delay:
+                pygame.time.wait(delay * 5)
+            game.reset(seed=game.rng.randrange(2 ** 32))
+            game.game_state = "game"
+            turns = 0
+        elif delay:
+            pygame.time.wait(delay)
+    pygame.quit()
+    return results, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="MCTS-автоигрок Тайного Культа")
+    parser.add_argument("--ending", default="ASCENSION", choices=list(ENDINGS), help="к какой концовке идти")
+    parser.add_argument("--budget", type=float, default=BUDGET, help="секунд на ход")
+    parser.add_argument("--games", type=int, default=10, help="число партий (0 - без конца, только с --demo/--soak)")
+    parser.add_argument("--seed", type=int, default=0, help="seed первой партии")
+    parser.add_argument("--demo", action="store_true", help="играть в окне игры с паузой между ходами")
+    parser.add_argument("--soak", action="store_true", help="играть в окне игры без пауз и проверять состояние после каждого хода")
+    parser.add_argument("--delay", type=int, default=300, help="мс между ходами в --demo")
+    args = parser.parse_args()
+    
+    player = MCTSPlayer(args.ending, args.budget, seed=args.seed)
+    if args.demo or args.soak:
+        results, elapsed = drive_ui(player, args.games, args.seed, 0 if args.soak else args.delay, args.soak)
+    else:
+        start = time.perf_counter()
+        results = []
+        for seed in range(args.seed, args.seed + args.games):
+            results.append(play(player, seed))
+            print(f"seed {seed}: {results[-1][0]} за {results[-1][1]} ходов")
+        elapsed = time.perf_counter() - start
+    
+    reached = [turns for ending, turns in results if ending == args.ending]
+    turns = sum(turns for ending, turns in results)
+    print(f"{args.ending}: {len(reached)} из {len(results)} партий"
+          + (f", в среднем за {sum(reached) / len(reached):.1f} ходов" if reached else "")
+          + f"; {turns} ходов за {elapsed:.1f} с")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+# Метрики игры: счетчики, датчики и гистограммы с фиксированными корзинами.
+#
+# Запись метрики - одна-две операции со словарем или списком без блокировок:
+# под GIL копия словаря (dict(values)) и списка делается целиком, поэтому поток
+# выгрузки читает их копии и не мешает циклу отрисовки. Сумма и счетчики одной
+# гистограммы в снимке могут разойтись на одно наблюдение, для метрик это не важно.
+#
+# MetricsExporter раз в interval секунд пишет снимок в формате Prometheus
+# (файл переписывается целиком, для textfile collector node_exporter) и
+# дописывает строку JSON в path + '.jsonl'.
+#
+# Выгрузка из игры:  python piepiee.py --metrics cult.prom
+
+EXPORT_INTERVAL = 10.0  # секунд между снимками
+JSONL_MAX_BYTES = 16 * 1024 * 1024  # после этого размера .jsonl переименовывается в .jsonl.1
+
+ACTION_BUCKETS = (5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 5e-3, 0.025)
+FRAME_BUCKETS = (0.001, 0.002, 0.004, 0.008, 0.0167, 0.033, 0.05, 0.1, 0.25)
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+class Metric:
+    """Метрика с метками: кортеж значений меток -> значение"""
+    kind = None
+    
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.values = {}
+    
+    def label_text(self, values, extra=()):
+        pairs = [f'{name}="{escape(value)}"' for name, value in zip(self.labels, values)]
+        pairs.extend(f'{name}="{value}"' for name, value in extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+    
+    def snapshot(self):
+        return dict(self.values)
+    
+    def prometheus(self, values):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(f"{self.name}{self.label_text(labels)} {value}" for labels, value in values.items())
+        return lines
+    
+    def json(self, values):
+        return [{"labels": dict(zip(self.labels, labels)), "value": value} for labels, value in values.items()]
+
+class Counter(Metric):
+    kind = "counter"
+    
+    def inc(self, labels=(), amount=1):
+        values = self.values
+        values[labels] = values.get(labels, 0) + amount
+
+class Gauge(Metric):
+    kind = "gauge"
+    
+    def set(self, value, labels=()):
+        self.values[labels] = value
+    
+    def clear(self):
+        self.values = {}
+
+class Histogram(Metric):
+    """Гистограмма: корзина i считает значения <= buckets[i], последняя - остальные"""
+    kind = "histogram"
+    
+    def __init__(self, name, help, buckets, labels=()):
+        Metric.__init__(self, name, help, labels)
+        self.buckets = tuple(buckets)
+    
+    def state(self, labels=()):
+        """Список [счетчики корзин..., сумма] для меток labels; его можно держать и менять на месте"""
+        state = self.values.get(labels)
+        if state is None:
+            state = self.values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        return state
+    
+    def observe(self, value, labels=()):
+        state = self.values.get(labels) or self.state(labels)
+        state[bisect_left(self.buckets, value)] += 1
+        state[-1] += value
+    
+    def snapshot(self):
+        return {labels: list(state) for labels, state in list(self.values.items())}
+    
+    def prometheus(self, values):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, state in values.items():
+            total = 0
+            for bound, count in zip(self.buckets + ("+Inf",), state):
+                total += count
+                lines.append(f"{self.name}_bucket{self.label_text(labels, [('le', bound)])} {total}")
+            lines.append(f"{self.name}_sum{self.label_text(labels)} {state[-1]}")
+            lines.append(f"{self.name}_count{self.label_text(labels)} {total}")
+        return lines
+    
+    def json(self, values):
+        return [{"labels": dict(zip(self.labels, labels)), "buckets": state[:-1], "sum": state[-1]}
+                for labels, state in values.items()]
+
+class Registry:
+    """Набор метрик и их выгрузка"""
+    def __init__(self):
+        self.metrics = []
+    
+    def add(self, metric):
+        self.metrics.append(metric)
+        return metric
+    
+    def counter(self, name, help, labels=()):
+        return self.add(Counter(name, help, labels))
+    
+    def gauge(self, name, help, labels=()):
+        return self.add(Gauge(name, help, labels))
+    
+    def histogram(self, name, help, buckets, labels=()):
+        return self.add(Histogram(name, help, buckets, labels))
+    
+    def snapshot(self):
+        return [(metric, metric.snapshot()) for metric in self.metrics]
+    
+    def prometheus(self, snapshot=None):
+        lines = []
+        for metric, values in snapshot or self.snapshot():
+            lines.extend(metric.prometheus(values))
+        return "\n".join(lines) + "\n"
+    
+    def json(self, snapshot=None):
+        record = {"time": round(time.time(), 3)}
+        for metric, values in snapshot or self.snapshot():
+            record[metric.name] = metric.json(values)
+        return json.dumps(record, ensure_ascii=False)
+
+class GameMetrics:
+    """Метрики партии CultGame"""
+    def __init__(self, registry=None):
+        self.registry = registry = registry or Registry()
+        self.actions = registry.counter("cult_actions_total", "Действия игрока по исходу", ("action", "outcome"))
+        self.action_seconds = registry.histogram("cult_action_seconds", "Время perform_action", ACTION_BUCKETS, ("action",))
+        self.cards_created = registry.counter("cult_cards_created_total", "Созданные карты (и карты, добавленные в стопки)", ("type",))
+        self.cards = registry.gauge("cult_cards", "Карт на столе по типам", ("type",))
+        self.endings = registry.counter("cult_endings_total", "Концовки", ("ending",))
+        self.frame_seconds = registry.histogram("cult_frame_seconds", "Работа кадра до clock.tick", FRAME_BUCKETS)
+        self.frame_misses = registry.counter("cult_frame_budget_misses_total", "Кадры дольше 1/FPS")
+        self.fps = registry.gauge("cult_fps", "FPS по clock.get_fps")
+        self.created = 0  # всего созданных карт: по нему perform_action узнает исход "card"
+        self.action_states = {}  # действие -> состояние гистограммы action_seconds
+    
+    # action и card_created вызываются на каждое действие и карту, поэтому пишут
+    # прямо в словари метрик, без вызовов Counter.inc и Histogram.observe
+    
+    def action(self, action, outcome, seconds):
+        counts = self.actions.values
+        key = (action, outcome)
+        counts[key] = counts.get(key, 0) + 1
+        state = self.action_states.get(action)
+        if state is None:
+            state = self.action_states[action] = self.action_seconds.state((action,))
+        state[bisect_left(ACTION_BUCKETS, seconds)] += 1
+        state[-1] += seconds
+    
+    def card_created(self, card_type, count):
+        self.created += 1
+        key = (card_type,)
+        counts = self.cards_created.values
+        counts[key] = counts.get(key, 0) + 1
+        self.cards.values[key] = count
+    
+    def count_cards(self, type_counts):
+        self.cards.clear()
+        for card_type, count in type_counts.items():
+            self.cards.set(count, (card_type,))
+    
+    def frame(self, seconds, budget):
+        self.frame_seconds.observe(seconds)
+        if seconds > budget:
+            self.frame_misses.inc()
+
+class MetricsExporter:
+    """Фоновый поток, который раз в interval секунд выгружает метрики в файлы"""
+    def __init__(self, registry, path, interval=EXPORT_INTERVAL):
+        self.registry = registry
+        self.path = path
+        self.jsonl_path = path + '.jsonl'
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.loop, name="metrics", daemon=True)
+    
+    def start(self):
+        self.thread.start()
+        return self
+    
+    def stop(self):
+        """Останавливает поток и пишет последний снимок"""
+        self.stopped.set()
+        self.thread.join()
+        self.export()
+    
+    def loop(self):
+        while not self.stopped.wait(self.interval):
+            self.export()
+    
+    def export(self):
+        snapshot = self.registry.snapshot()
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.registry.prometheus(snapshot))
+        os.replace(tmp_path, self.path)
+        
+        if os.path.exists(self.jsonl_path) and os.path.getsize(self.jsonl_path) >= JSONL_MAX_BYTES:
+            os.replace(self.jsonl_path, self.jsonl_path + '.1')
+        with open(self.jsonl_path, 'a', encoding='utf-8') as f:
+            f.write(self.registry.json(snapshot) + "\n")
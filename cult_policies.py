@@ -0,0 +1,190 @@
+import argparse
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from cult_rules import ENDINGS, CultRules
+
+# Сравнение стратегий игры на многих seed. Партии идут на CultRules без окна,
+# seed делятся на порции и раздаются процессам ProcessPoolExecutor, результаты
+# порций сливаются по мере готовности и сразу отдаются вызывающему.
+#
+# Стратегия - функция policy(game, rng) -> название действия. Она должна лежать
+# на уровне модуля: в процессы передается только ее имя из POLICIES.
+
+OUTCOMES = list(ENDINGS) + ["NONE"]  # NONE - партия не закончилась за max_turns
+
+def random_policy(game, rng):
+    """Случайная видимая кнопка"""
+    return rng.choice(game.available_actions())
+
+def cult_step(game):
+    # Общая часть стратегий: создать культ, как только можно
+    if "Создать культ" in game.available_actions():
+        return "Создать культ"
+    return None
+
+def work_then_study(game, rng):
+    """Работать, пока денег меньше 5, затем изучать; ритуал, когда он дает концовку"""
+    action = cult_step(game)
+    if action:
+        return action
+    if game.cult_created and game.perform_ritual_check():
+        return "Ритуал"
+    if game.health <= 3 or game.reason <= 2:
+        return "Отдых" if game.funds > 0 else "Работать"
+    if game.funds < 5:
+        return "Работать"
+    return "Изучать"
+
+def dream_rush(game, rng):
+    """Только сны: прямой путь к БЕЗУМИЮ"""
+    return "Сны"
+
+def gather_followers(game, rng):
+    """Беседы до пяти последователей, затем ритуал ЛИДЕРА КУЛЬТА"""
+    action = cult_step(game)
+    if action:
+        return action
+    if game.cult_created and game.count_cards('follower') >= 5:
+        return "Ритуал"
+    if not game.ancient_knowledge and game.count_cards('follower') >= 2:
+        return "Изучать" if game.reason > 2 else "Отдых" if game.funds > 0 else "Работать"
+    return "Беседовать"
+
+POLICIES = {
+    "random": random_policy,
+    "work_then_study": work_then_study,
+    "dream_rush": dream_rush,
+    "followers": gather_followers,
+}
+
+def play(policy, seed, max_turns=500):
+    """Одна партия: (концовка, число ходов)"""
+    game = CultRules(random.Random(seed))
+    rng = random.Random(f"policy:{seed}")
+    for turn in range(1, max_turns + 1):
+        game.perform_action(policy(game, rng))
+        if game.game_state == "ending":
+            return game.current_ending, turn
+    return "NONE", max_turns
+
+class PolicyStats:
+    """Концовки и длительность партий одной стратегии"""
+    def __init__(self, policy):
+        self.policy = policy
+        self.games = 0
+        self.endings = dict.fromkeys(OUTCOMES, 0)
+        # Сумма и сумма квадратов длительностей - для среднего и его разброса
+        self.turns = 0
+        self.turns_squared = 0
+    
+    def add_game(self, ending, turns):
+        self.games += 1
+        self.endings[ending] += 1
+        self.turns += turns
+        self.turns_squared += turns * turns
+    
+    def merge(self, other):
+        self.games += other.games
+        for ending, count in other.endings.items():
+            self.endings[ending] += count
+        self.turns += other.turns
+        self.turns_squared += other.turns_squared
+    
+    def rate(self, ending):
+        return self.endings[ending] / self.games if self.games else 0.0
+    
+    def rate_interval(self, ending, z=1.96):
+        """Доверительный интервал доли концовки (Уилсон, по умолчанию 95%)"""
+        n = self.games
+        if not n:
+            return 0.0, 1.0
+        p = self.endings[ending] / n
+        center = (p + z * z / (2 * n)) / (1 + z * z / n)
+        spread = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / (1 + z * z / n)
+        return max(0.0, center - spread), min(1.0, center + spread)
+    
+    def mean_turns(self):
+        return self.turns / self.games if self.games else 0.0
+    
+    def turns_interval(self, z=1.96):
+        """Доверительный интервал средней длины партии"""
+        n = self.games
+        if n < 2:
+            return 0.0, float(self.turns)
+        mean = self.turns / n
+        variance = max(0.0, (self.turns_squared - n * mean * mean) / (n - 1))
+        spread = z * math.sqrt(variance / n)
+        return mean - spread, mean + spread
+
+def run_shard(policy_name, first_seed, games, max_turns):
+    """Порция партий в процессе пула: seed от first_seed подряд"""
+    policy = POLICIES[policy_name]
+    stats = PolicyStats(policy_name)
+    for seed in range(first_seed, first_seed + games):
+        stats.add_game(*play(policy, seed, max_turns))
+    return stats
+
+def evaluate(policies, games, seed=0, workers=None, shard_size=2000, max_turns=500):
+    """Генератор: после каждой готовой порции отдает (имя стратегии, PolicyStats)
+    
+    Все стратегии играют на одних и тех же seed, поэтому их можно сравнивать
+    между собой. Статистика накапливается: последняя отданная для стратегии -
+    итоговая.
+    """
+    totals = {name: PolicyStats(name) for name in policies}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run_shard, name, seed + start, min(shard_size, games - start), max_turns)
+                   for start in range(0, games, shard_size)
+                   for name in policies]
+        try:
+            for future in as_completed(futures):
+                shard = future.result()
+                totals[shard.policy].merge(shard)
+                yield shard.policy, totals[shard.policy]
+        finally:
+            # Если вызывающий перестал читать результаты, оставшиеся порции не нужны
+            for future in futures:
+                future.cancel()
+
+def format_stats(stats):
+    rates = "  ".join(f"{ending} {stats.rate(ending):6.1%}" for ending in OUTCOMES)
+    low, high = stats.turns_interval()
+    return f"{stats.policy:16} {stats.games:8}  {rates}  ходов {stats.mean_turns():6.1f} [{low:.1f}; {high:.1f}]"
+
+def main():
+    parser = argparse.ArgumentParser(description="Сравнение стратегий на многих seed")
+    parser.add_argument("policies", nargs="*", help=f"стратегии: {', '.join(POLICIES)} (по умолчанию все)")
+    parser.add_argument("--games", type=int, default=20000, help="партий на стратегию")
+    parser.add_argument("--seed", type=int, default=0, help="первый seed")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--shard-size", type=int, default=2000)
+    parser.add_argument("--max-turns", type=int, default=500)
+    parser.add_argument("--quiet", action="store_true", help="не печатать промежуточные итоги")
+    args = parser.parse_args()
+    args.policies = args.policies or list(POLICIES)
+    unknown = [name for name in args.policies if name not in POLICIES]
+    if unknown:
+        parser.error(f"неизвестные стратегии: {', '.join(unknown)}")
+    
+    start = time.perf_counter()
+    totals = {}
+    for name, stats in evaluate(args.policies, args.games, args.seed, args.workers, args.shard_size, args.max_turns):
+        totals[name] = stats
+        if not args.quiet:
+            print(format_stats(stats), flush=True)
+    elapsed = time.perf_counter() - start
+    
+    print(f"\nИтог ({args.workers} процессов, {elapsed:.2f} с):")
+    for name in args.policies:
+        stats = totals[name]
+        print(format_stats(stats))
+        for ending in OUTCOMES:
+            low, high = stats.rate_interval(ending)
+            print(f"    {ending:12} {stats.rate(ending):7.2%}  95% [{low:.2%}; {high:.2%}]")
+
+if __name__ == "__main__":
+    main()
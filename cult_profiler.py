@@ -0,0 +1,169 @@
+import json
+import time
+from array import array
+
+import pygame
+
+# Профайлер кадра. Главный цикл отмечает конец каждой фазы (mark), время фазы -
+# разница perf_counter_ns с предыдущей отметкой. Время хранится в кольцевых
+# буферах на последние size кадров, поэтому память не растет. Во время записи
+# для выгрузки (capture) заполненный буфер перед перезаписью копируется целиком
+# в список блоков - так сохраняются все кадры (около 170 байт на кадр).
+#
+# F3 в игре показывает поверх экрана p50/p95/p99 каждой фазы и FPS.
+# Записать и выгрузить кадры:  python piepiee.py --profile frames.jsonl
+# (файл .json - формат Chrome trace для chrome://tracing и Perfetto)
+#
+# Пока профайлер выключен, цикл только проверяет флаг enabled.
+
+PHASES = (
+    "events",   # обработка ввода
+    "dirty",    # поиск изменившихся областей (DirtyRenderer)
+    "ui",       # фон, заголовок, ресурсы, панель и кнопки
+    "hover",    # поиск карты под курсором
+    "cards",    # Card.draw
+    "log",      # журнал событий
+    "screen",   # меню или концовка
+    "overlay",  # сам оверлей профайлера
+    "flip",     # вывод кадра на экран
+    "wait",     # ожидание следующего кадра (clock.tick)
+)
+
+HISTORY = 600  # кадров в буферах (10 секунд при 60 FPS)
+OVERLAY_REFRESH = 15  # оверлей пересчитывается раз в столько кадров
+
+class FrameProfiler:
+    """Время фаз кадра в кольцевых буферах"""
+    def __init__(self, size=HISTORY):
+        self.size = size
+        self.enabled = False  # записывать ли кадры
+        self.overlay = False  # показывать ли оверлей
+        self.capture = False  # записывать и без оверлея (для выгрузки)
+        self.reset()
+    
+    def reset(self):
+        self.frames = 0  # всего записано кадров
+        self.slot = 0
+        self.last = 0
+        self.starts = array('q', bytes(8 * self.size))
+        # Длительность фазы в кадре (0 - фазы не было) и ее начало от начала кадра
+        self.durations = {phase: array('q', bytes(8 * self.size)) for phase in PHASES}
+        self.offsets = {phase: array('q', bytes(8 * self.size)) for phase in PHASES}
+        self.chunks = []  # копии буферов, записанные при capture: (первый кадр, starts, durations, offsets)
+        self.surface = None
+    
+    def toggle_overlay(self):
+        self.overlay = not self.overlay
+        self.surface = None
+        self.enable(self.overlay or self.capture)
+    
+    def start_capture(self):
+        self.capture = True
+        self.enable(True)
+    
+    def enable(self, enabled):
+        # Включение посреди кадра: отметки до конца кадра идут в новый кадр
+        if enabled and not self.enabled:
+            self.begin_frame()
+        self.enabled = enabled
+    
+    def begin_frame(self):
+        now = time.perf_counter_ns()
+        slot = self.slot = self.frames % self.size
+        if self.capture and not slot and self.frames:
+            # Буфер заполнен кадрами frames - size .. frames - 1 по порядку слотов
+            self.chunks.append((self.frames - self.size, self.starts[:],
+                                {phase: durations[:] for phase, durations in self.durations.items()},
+                                {phase: offsets[:] for phase, offsets in self.offsets.items()}))
+        self.frames += 1
+        self.starts[slot] = now
+        for phase in PHASES:
+            self.durations[phase][slot] = 0
+        self.last = now
+    
+    def mark(self, phase):
+        """Конец фазы phase: время с предыдущей отметки. Повторные отметки за кадр складываются"""
+        now = time.perf_counter_ns()
+        slot = self.slot
+        durations = self.durations[phase]
+        if not durations[slot]:
+            self.offsets[phase][slot] = self.last - self.starts[slot]
+        durations[slot] += now - self.last
+        self.last = now
+    
+    def recorded(self):
+        """Слоты записанных кадров от старых к новым"""
+        count = min(self.frames, self.size)
+        return [frame % self.size for frame in range(self.frames - count, self.frames)]
+    
+    def percentiles(self, phase, quantiles=(0.5, 0.95, 0.99)):
+        """Перцентили длительности фазы в наносекундах (по кадрам, где фаза была)"""
+        durations = self.durations[phase]
+        values = sorted(durations[slot] for slot in self.recorded() if durations[slot])
+        if not values:
+            return None
+        return [values[min(len(values) - 1, int(q * len(values)))] for q in quantiles]
+    
+    def fps(self):
+        slots = self.recorded()
+        if len(slots) < 2:
+            return 0.0
+        elapsed = self.starts[slots[-1]] - self.starts[slots[0]]
+        return (len(slots) - 1) * 1e9 / elapsed if elapsed else 0.0
+    
+    def draw(self, screen, font):
+        """Рисует оверлей в левом верхнем углу и возвращает его прямоугольник"""
+        if self.surface is None or self.frames % OVERLAY_REFRESH == 0:
+            lines = [f"FPS {self.fps():5.1f}   p50   p95   p99 мс"]
+            for phase in PHASES:
+                values = self.percentiles(phase)
+                if values:
+                    lines.append(f"{phase:8}" + "".join(f"{value / 1e6:6.2f}" for value in values))
+            height = font.get_linesize()
+            width = max(font.size(line)[0] for line in lines)
+            self.surface = pygame.Surface((width + 12, len(lines) * height + 8))
+            self.surface.fill((0, 0, 0))
+            pygame.draw.rect(self.surface, (0, 200, 0), self.surface.get_rect(), 1)
+            for i, line in enumerate(lines):
+                self.surface.blit(font.render(line, True, (0, 255, 0)), (6, 4 + i * height))
+        return screen.blit(self.surface, (4, 4))
+    
+    def frame_records(self):
+        """Записанные кадры: (номер кадра, начало в нс, {фаза: (начало от кадра, длительность)})"""
+        for first, starts, durations, offsets in self.chunks:
+            for slot in range(self.size):
+                phases = {phase: (offsets[phase][slot], durations[phase][slot])
+                          for phase in PHASES if durations[phase][slot]}
+                yield first + slot, starts[slot], phases
+        # Из кольцевого буфера - кадры, которых нет в блоках
+        first = self.frames - min(self.frames, self.size)
+        if self.chunks:
+            first = max(first, self.chunks[-1][0] + self.size)
+        for frame in range(first, self.frames):
+            slot = frame % self.size
+            phases = {phase: (self.offsets[phase][slot], self.durations[phase][slot])
+                      for phase in PHASES if self.durations[phase][slot]}
+            yield frame, self.starts[slot], phases
+    
+    def export(self, path):
+        """Выгружает кадры: .json - Chrome trace, иначе JSONL (строка на кадр, время в нс)"""
+        with open(path, 'w', encoding='utf-8') as f:
+            if path.endswith(".json"):
+                json.dump(self.chrome_trace(), f)
+            else:
+                for frame, start, phases in self.frame_records():
+                    record = {"frame": frame, "start_ns": start}
+                    record.update((phase, duration) for phase, (offset, duration) in phases.items())
+                    f.write(json.dumps(record) + "\n")
+    
+    def chrome_trace(self):
+        # Каждая фаза - событие "X" с началом и длительностью в микросекундах
+        events = []
+        for frame, start, phases in self.frame_records():
+            total = sum(duration for offset, duration in phases.values())
+            events.append({"name": "frame", "ph": "X", "pid": 1, "tid": 1, "ts": start / 1000,
+                           "dur": total / 1000, "args": {"frame": frame}})
+            for phase, (offset, duration) in phases.items():
+                events.append({"name": phase, "ph": "X", "pid": 1, "tid": 1,
+                               "ts": (start + offset) / 1000, "dur": duration / 1000})
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
@@ -0,0 +1,122 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+
+import pygame
+
+# Запись и воспроизведение партий. Запись - это seed и поток ввода (клавиши,
+# нажатия мыши и движение мыши во время перетаскивания) с номерами кадров.
+# Вся случайность игры идет из генераторов, созданных по seed, поэтому
+# воспроизведение повторяет партию точно.
+#
+# Записать:       python piepiee.py --record session.jsonl [--seed N]
+# Воспроизвести:  python cult_replay.py session.jsonl [--fast] [--no-draw]
+
+VERSION = 1
+
+def state_digest(game):
+    """Короткий отпечаток состояния правил для сравнения партий"""
+    cards = sorted((card.uid, card.title, card.description, card.type, card.value,
+                    card.x, card.y, card.z_index, card.order, card.count) for card in game.cards)
+    state = [game.health, game.reason, game.funds, game.cult_created, game.current_ending, cards, list(game.log_entries)]
+    return hashlib.sha1(json.dumps(state, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+class SessionRecorder:
+    """Пишет seed и ввод игрока в файл JSONL"""
+    def __init__(self, path, seed):
+        self.file = open(path, 'w', encoding='utf-8')
+        self.write({"version": VERSION, "seed": seed})
+    
+    def write(self, record):
+        self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+    
+    def record(self, frame, event, dragging):
+        if event.type == pygame.KEYDOWN:
+            self.write([frame, "key", event.key])
+        elif event.type == pygame.MOUSEBUTTONDOWN:
+            self.write([frame, "down", event.pos[0], event.pos[1], event.button])
+        elif event.type == pygame.MOUSEBUTTONUP:
+            self.write([frame, "up", event.pos[0], event.pos[1], event.button])
+        elif event.type == pygame.MOUSEMOTION and dragging:
+            # Движение без перетаскивания меняет только подсветку, его не пишем
+            self.write([frame, "move", event.pos[0], event.pos[1]])
+        elif event.type == pygame.QUIT:
+            self.write([frame, "quit"])
+    
+    def close(self, game):
+        self.write({"frames": game.frame, "digest": state_digest(game)})
+        self.file.close()
+
+class SessionReplay:
+    """Подает записанный ввод в CultGame.run вместо настоящих событий"""
+    def __init__(self, path):
+        self.events = []
+        self.footer = None
+        with open(path, encoding='utf-8') as f:
+            header = json.loads(f.readline())
+            if header.get("version") != VERSION:
+                raise ValueError(f"Неизвестная версия записи: {header.get('version')}")
+            self.seed = header["seed"]
+            for line in f:
+                record = json.loads(line)
+                if isinstance(record, dict):
+                    self.footer = record
+                else:
+                    self.events.append(record)
+        self.position = 0
+    
+    @property
+    def finished(self):
+        return self.position >= len(self.events)
+    
+    def next_frame(self):
+        return self.events[self.position][0] if not self.finished else None
+    
+    def events_at(self, frame):
+        """События кадра frame в виде событий pygame"""
+        events = []
+        while not self.finished and self.events[self.position][0] <= frame:
+            record = self.events[self.position]
+            self.position += 1
+            kind = record[1]
+            if kind == "key":
+                events.append(pygame.event.Event(pygame.KEYDOWN, key=record[2]))
+            elif kind == "down":
+                events.append(pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=(record[2], record[3]), button=record[4]))
+            elif kind == "up":
+                events.append(pygame.event.Event(pygame.MOUSEBUTTONUP, pos=(record[2], record[3]), button=record[4]))
+            elif kind == "move":
+                events.append(pygame.event.Event(pygame.MOUSEMOTION, pos=(record[2], record[3])))
+            elif kind == "quit":
+                events.append(pygame.event.Event(pygame.QUIT))
+        return events
+
+def main():
+    parser = argparse.ArgumentParser(description="Воспроизведение записанной партии")
+    parser.add_argument("path")
+    parser.add_argument("--fast", action="store_true", help="без окна и без ограничения FPS")
+    parser.add_argument("--no-draw", action="store_true", help="не рисовать кадры (только правила)")
+    args = parser.parse_args()
+    
+    # Драйвер SDL выбирается при инициализации pygame, то есть до импорта игры
+    if args.fast:
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
+    from piepiee import CultGame
+    
+    replay = SessionReplay(args.path)
+    game = CultGame(seed=replay.seed, save_path=None, log_dir=None)
+    start = time.perf_counter()
+    game.run(replay=replay, fast=args.fast, draw=not args.no_draw)
+    elapsed = time.perf_counter() - start
+    
+    digest = state_digest(game)
+    print(f"{game.frame} кадров за {elapsed:.2f} с, концовка: {game.current_ending}, отпечаток {digest}")
+    if replay.footer and replay.footer.get("digest") != digest:
+        print(f"Состояние не совпало с записью ({replay.footer.get('digest')})")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,432 @@
+import random
+from collections import deque
+
+# Правила игры без pygame: их можно гонять без окна и шрифтов
+
+# Действия (кнопки на панели, в том же порядке)
+ACTIONS = ["Работать", "Изучать", "Сны", "Беседовать", "Исследовать", "Отдых", "Ритуал", "Создать культ"]
+
+LOG_SIZE = 5  # последних записей журнала в состоянии партии (вся история - cult_log)
+
+# Типы карт
+CARD_TYPES = ['resource', 'lore', 'follower', 'aspect', 'location', 'cult']
+
+# Концовки
+ENDINGS = {
+    "ASCENSION": {
+        "title": "ВОЗНЕСЕНИЕ",
+        "description": "Вы собрали все компоненты и провели Великий Ритуал. Древние силы признали вас достойным и вознесли за пределы материального мира."
+    },
+    "MADNESS": {
+        "title": "БЕЗУМИЕ",
+        "description": "Вы заглянули слишком глубоко в бездну. Ваш разум не выдержал столкновения с невыразимыми истинами."
+    },
+    "CULT_LEADER": {
+        "title": "ЛИДЕР КУЛЬТА",
+        "description": "Вы основали процветающий культ. Члены поклоняются вам как пророку. Ваше влияние растет с каждым днем."
+    },
+    "FORGOTTEN": {
+        "title": "ЗАБЫТЫЙ",
+        "description": "Ваши поиски привели в забытые уголки мира, но вы так и не нашли того, что искали. Постепенно о вас забыли."
+    }
+}
+
+class CardData:
+    """Карта без графики. count - сколько одинаковых карт лежит в этой стопке"""
+    __slots__ = ('uid', 'title', 'description', 'type', 'value', 'x', 'y', 'z_index', 'order', 'count')
+    
+    def __init__(self, title, description, card_type, value=None, x=None, y=None):
+        self.title = title
+        self.description = description
+        self.type = card_type
+        self.value = value
+        self.x = x if x is not None else 0
+        self.y = y if y is not None else 0
+        self.z_index = 0
+        self.order = 0
+        self.count = 1
+
+class CultRules:
+    """Состояние игры и правила. Случайность берется из self.rng"""
+    # Одинаковые карты (тип, название, описание и значение) складываются в одну стопку,
+    # счетчики типов и проверки концовок считают карты в стопках
+    stack_cards = True
+    
+    def __init__(self, rng=None):
+        self.rng = rng if rng is not None else random.Random()
+        self.journal = None  # cult_save.GameJournal, если игра сохраняется
+        
+        # Игровое состояние
+        self.health = 10
+        self.reason = 10
+        self.funds = 5
+        self.cards = []
+        self.next_uid = 0
+        # Порядок отрисовки - ключ (z_index, order). Новая или поднятая карта получает
+        # z_index = top_z и следующий order, то есть ключ больше всех остальных
+        self.card_order = 0
+        self.top_z = 0
+        # Индекс карт: (тип, название) -> карты, и счетчики по типам
+        self.card_index = {}
+        self.type_counts = {}
+        self.ancient_knowledge = 0  # карты знаний с "Древнее знание" в названии
+        self.log_entries = deque(["Вы начинаете свой путь в тайных знаниях..."], LOG_SIZE)
+        self.cult_created = False
+        self.has_ancient_knowledge = False
+        self.has_first_follower = False
+        
+        self.endings = ENDINGS
+        self.game_state = "game"  # game, ending
+        self.current_ending = None
+        
+        # Создаем начальные карты
+        self.create_card("Здоровье", "Ваша жизненная сила", 'resource', self.health, 20, 100)
+        self.create_card("Рассудок", "Ваша ментальная стабильность", 'resource', self.reason, 160, 100)
+        self.create_card("Деньги", "Средства к существованию", 'resource', self.funds, 300, 100)
+        self.create_card("Старая книга", "Тайные знания ждут изучения", 'lore', None, 20, 280)
+        self.create_card("Таинственный незнакомец", "Проявил интерес к оккультному", 'follower', None, 160, 280)
+    
+    def new_card(self, title, desc, card_type, value=None, x=None, y=None):
+        # Представление может подменить карту на свою (с графикой)
+        return CardData(title, desc, card_type, value, x, y)
+    
+    def create_card(self, title, desc, card_type, value=None, x=None, y=None, stack=True):
+        """Новая карта; если такая уже лежит на столе, она добавляется в ее стопку"""
+        if stack and self.stack_cards:
+            # То же, что find_stack, без лишнего вызова: карты создаются почти каждым действием
+            for card in self.card_index.get((card_type, title), ()):
+                if card.description == desc and card.value == value:
+                    self.set_card_count(card, card.count + 1)
+                    return card
+        card = self.new_card(title, desc, card_type, value, x, y)
+        card.uid = self.next_uid
+        self.next_uid += 1
+        card.z_index = self.top_z
+        self.card_order += 1
+        card.order = self.card_order
+        self.add_card(card)
+        if self.journal is not None:
+            self.journal.card_added(card)
+        return card
+    
+    def add_card(self, card):
+        self.cards.append(card)
+        self.index_card(card)
+        self.top_z = max(self.top_z, card.z_index)
+    
+    def add_cards(self, cards):
+        # Для загрузки: карты уже готовы и упорядочены снизу вверх
+        self.cards.extend(cards)
+        for card in cards:
+            self.index_card(card)
+            self.top_z = max(self.top_z, card.z_index)
+    
+    def remove_card(self, card):
+        self.cards.remove(card)
+        self.unindex_card(card)
+        if self.journal is not None:
+            self.journal.card_removed(card)
+    
+    def find_stack(self, card_type, title, description, value=None):
+        """Первая стопка с такими же картами или None"""
+        for card in self.card_index.get((card_type, title), ()):
+            if card.description == description and card.value == value:
+                return card
+        return None
+    
+    def set_card_count(self, card, count):
+        delta = count - card.count
+        card.count = count
+        self.type_counts[card.type] += delta
+        if card.type == 'lore' and "Древнее знание" in card.title:
+            self.ancient_knowledge += delta
+        if self.journal is not None:
+            self.journal.card_count_changed(card)
+    
+    def split_card(self, card):
+        """Снимает со стопки одну карту и кладет ее сверху на то же место"""
+        self.set_card_count(card, card.count - 1)
+        return self.create_card(card.title, card.description, card.type, card.value, card.x, card.y, stack=False)
+    
+    def merge_card(self, stack, card):
+        """Перекладывает карты из card в стопку stack"""
+        self.set_card_count(stack, stack.count + card.count)
+        self.remove_card(card)
+    
+    def clear_cards(self):
+        self.cards = []
+        self.card_index = {}
+        self.type_counts = {}
+        self.ancient_knowledge = 0
+        self.top_z = 0
+    
+    def rename_card(self, card, title, description):
+        # Название входит в ключ индекса, поэтому карту переиндексируем
+        self.unindex_card(card)
+        card.title = title
+        card.description = description
+        self.index_card(card)
+        if self.journal is not None:
+            self.journal.card_updated(card)
+    
+    def raise_card(self, card):
+        card.z_index = self.top_z
+        self.card_order += 1
+        card.order = self.card_order
+    
+    def place_card(self, card, x, y, z_index, order):
+        card.x = x
+        card.y = y
+        card.z_index = z_index
+        card.order = order
+        self.top_z = max(self.top_z, z_index)
+    
+    def index_card(self, card):
+        key = (card.type, card.title)
+        cards = self.card_index.get(key)
+        if cards is None:
+            self.card_index[key] = [card]
+        else:
+            cards.append(card)
+        self.type_counts[card.type] = self.type_counts.get(card.type, 0) + card.count
+        if card.type == 'lore' and "Древнее знание" in card.title:
+            self.ancient_knowledge += card.count
+    
+    def unindex_card(self, card):
+        key = (card.type, card.title)
+        cards = self.card_index[key]
+        cards.remove(card)
+        if not cards:
+            del self.card_index[key]
+        self.type_counts[card.type] -= card.count
+        if card.type == 'lore' and "Древнее знание" in card.title:
+            self.ancient_knowledge -= card.count
+    
+    def count_cards(self, card_type):
+        return self.type_counts.get(card_type, 0)
+    
+    def find_cards(self, card_type, title):
+        return self.card_index.get((card_type, title), ())
+    
+    def update_resources(self):
+        # Вызывается на каждое действие: ключи индекса - константы, без вызовов find_cards
+        index = self.card_index
+        for card in index.get(('resource', "Здоровье"), ()):
+            card.value = self.health
+        for card in index.get(('resource', "Рассудок"), ()):
+            card.value = self.reason
+        for card in index.get(('resource', "Деньги"), ()):
+            card.value = self.funds
+    
+    def add_log(self, text):
+        self.log_entries.append(text)
+        if self.journal is not None:
+            self.journal.logged(text)
+    
+    def check_cult_creation(self):
+        has_knowledge = self.ancient_knowledge > 0
+        has_follower = self.type_counts.get('follower', 0) > 0
+        
+        self.has_ancient_knowledge = has_knowledge
+        self.has_first_follower = has_follower
+        
+        return has_knowledge and has_follower and not self.cult_created
+    
+    def available_actions(self):
+        """Действия, доступные игроку (видимые кнопки)"""
+        actions = ACTIONS[:6]
+        if self.cult_created:
+            actions.append("Ритуал")
+        elif self.has_ancient_knowledge and self.has_first_follower:
+            actions.append("Создать культ")
+        return actions
+    
+    def perform_ritual_check(self):
+        """Проверяет условия для концовок через ритуалы"""
+        if not self.count_cards('cult'):
+            return None
+        
+        follower_count = self.count_cards('follower')
+        
+        # Ритуал Вознесения
+        if self.count_cards('lore') >= 3 and follower_count >= 2:
+            return "ASCENSION"
+        
+        # Ритуал Безумия
+        if self.count_cards('aspect') >= 5:
+            return "MADNESS"
+        
+        # Ритуал Лидера Культа
+        if follower_count >= 5:
+            return "CULT_LEADER"
+        
+        # Ритуал Забвения
+        if self.count_cards('location') >= 3:
+            return "FORGOTTEN"
+        
+        return None
+    
+    def perform_action(self, action):
+        done = self.apply_action(action)
+        if self.journal is not None:
+            self.journal.state_changed(self)
+            self.journal.maybe_compact(self)
+        return done
+    
+    def apply_action(self, action):
+        """Применяет действие; возвращает False, если оно не удалось (не хватило ресурсов и т.п.)"""
+        msg = ""
+        done = True
+        
+        if action == "Работать":
+            if self.health > 2:
+                self.funds += 2
+                self.health -= 1
+                msg = "Вы работаете и зарабатываете деньги. Здоровье ухудшается."
+                
+                if self.rng.random() > 0.8:
+                    # Исправленная подпись: не "последователь", пока культ не создан
+                    if self.cult_created:
+                        self.create_card("Последователь", "Член вашего культа", 'follower')
+                        msg += " Вы находите нового последователя."
+                    else:
+                        self.create_card("Заинтересованный", "Проявил интерес к вашим идеям", 'follower')
+                        msg += " Кто-то проявил интерес."
+            else:
+                msg = "Вы слишком истощены для работы."
+                done = False
+        
+        elif action == "Изучать":
+            if self.reason > 1:
+                if self.count_cards('lore'):
+                    self.reason -= 1
+                    msg = "Вы изучаете древние тексты. Рассудок страдает."
+                    
+                    if self.rng.random() > 0.7:
+                        self.create_card("Древнее знание", "Запретные знания предков", 'lore')
+                        self.has_ancient_knowledge = True
+                        msg += " Вы находите древнее знание."
+                else:
+                    msg = "У вас нет материалов для изучения."
+                    done = False
+            else:
+                msg = "Ваш рассудок слишком хрупок."
+                done = False
+        
+        elif action == "Сны":
+            if self.reason > 0:
+                self.reason -= 1
+                msg = "Вы погружаетесь в странные сны. Рассудок страдает."
+                
+                if self.rng.random() > 0.7:
+                    self.create_card("Видение", "Образ из снов", 'aspect')
+                    msg += " Вы получаете видение."
+            else:
+                msg = "Вы слишком близки к безумию, чтобы спать."
+                done = False
+        
+        elif action == "Беседовать":
+            msg = "Вы ищете единомышленников."
+            
+            if self.rng.random() > 0.5:
+                # Исправленная подпись в зависимости от наличия культа
+                if self.cult_created:
+                    self.create_card("Новичок", "Новый член культа", 'follower')
+                    msg += " Вы находите нового члена культа."
+                else:
+                    self.create_card("Сочувствующий", "Интересуется оккультизмом", 'follower')
+                    self.has_first_follower = True
+                    msg += " Вы находите сочувствующего."
+            else:
+                msg += " Никто не проявил интереса."
+        
+        elif action == "Исследовать":
+            if self.funds > 0:
+                self.funds -= 1
+                msg = "Вы исследуете окрестности."
+                
+                if self.rng.random() > 0.6:
+                    self.create_card("Заброшенный храм", "Место, полное тайн", 'location')
+                    msg += " Вы находите заброшенный храм."
+            else:
+                msg = "У вас недостаточно денег."
+                done = False
+        
+        elif action == "Отдых":
+            if self.funds > 0:
+                self.funds -= 1
+                self.health = min(10, self.health + 2)
+                self.reason = min(10, self.reason + 1)
+                msg = "Вы отдыхаете и восстанавливаете силы."
+            else:
+                msg = "У вас недостаточно денег для отдыха."
+                done = False
+        
+        elif action == "Ритуал":
+            if not self.cult_created:
+                msg = "Сначала создайте культ!"
+                done = False
+            else:
+                ritual_result = self.perform_ritual_check()
+                if ritual_result:
+                    self.game_state = "ending"
+                    self.current_ending = ritual_result
+                    return done
+                else:
+                    if self.health > 1 and self.reason > 1:
+                        self.health -= 1
+                        self.reason -= 1
+                        msg = "Вы проводите таинственный ритуал."
+                        
+                        if self.rng.random() > 0.8:
+                            self.create_card("Древний артефакт", "Предмет невероятной силы", 'lore')
+                            msg += " Ритуал увенчался успехом!"
+                        else:
+                            msg += " Ритуал не принес результатов."
+                    else:
+                        msg = "Недостаточно здоровья или рассудка."
+                        done = False
+        
+        elif action == "Создать культ":
+            if self.check_cult_creation():
+                self.create_card("Тайный культ", "Ваша организация", 'cult')
+                self.cult_created = True
+                msg = "Вы создали Тайный культ! Теперь можете проводить ритуалы."
+                
+                # Переименовываем существующих "сочувствующих" в "последователей"
+                # (стопки разных сочувствующих сливаются в одну стопку последователей)
+                renamed = [key for key in self.card_index
+                           if key[0] == 'follower' and ("Сочувствующий" in key[1] or "Заинтересованный" in key[1])]
+                for key in renamed:
+                    for card in list(self.card_index[key]):
+                        stack = self.find_stack('follower', "Последователь", "Член вашего культа") if self.stack_cards else None
+                        if stack is not None:
+                            self.merge_card(stack, card)
+                        else:
+                            self.rename_card(card, "Последователь", "Член вашего культа")
+            else:
+                msg = "Нужно Древнее знание и хотя бы один сочувствующий."
+                done = False
+        
+        self.add_log(msg)
+        self.update_resources()
+        self.check_cult_creation()
+        
+        # Автоматические концовки (без ритуала)
+        if self.reason <= 0:
+            self.game_state = "ending"
+            self.current_ending = "MADNESS"
+            return done
+        
+        if self.health <= 0:
+            self.game_state = "ending"
+            self.current_ending = "FORGOTTEN"
+            return done
+        
+        # Много видений = безумие
+        if self.type_counts.get('aspect', 0) >= 7:
+            self.game_state = "ending"
+            self.current_ending = "MADNESS"
+            return done
+        
+        return done
@@ -0,0 +1,293 @@
+import os
+import struct
+from collections import deque
+
+from cult_rules import CARD_TYPES, LOG_SIZE
+
+# Сохранение игры: бинарный снимок состояния плюс журнал событий, который только
+# дописывается. Каждое событие - одна короткая запись в конец файла, поэтому
+# сохранение не задерживает кадр. Когда событий накопится много, журнал
+# сворачивается в новый снимок.
+#
+# Снимок и журнал помечены поколением: если игра упала между записью снимка и
+# очисткой журнала, журнал старого поколения при загрузке пропускается.
+
+SNAPSHOT_MAGIC = b'CULTSNAP'
+JOURNAL_MAGIC = b'CULTJRNL'
+VERSION = 2
+READABLE_VERSIONS = (1, 2)  # в версии 1 не было стопок (count)
+
+GAME_STATES = ["game", "ending"]
+ENDINGS = [None, "ASCENSION", "MADNESS", "CULT_LEADER", "FORGOTTEN"]
+NO_VALUE = -2 ** 31
+
+HEADER = struct.Struct('<8sBI')
+STATE = struct.Struct('<hhhBBBII')
+CARD = struct.Struct('<IBiiiiIIII')
+CARD_V1 = struct.Struct('<IBiiiiIII')
+COUNT = struct.Struct('<I')
+RECORD = struct.Struct('<BH')
+
+# События журнала
+EVENT_STATE = 1
+EVENT_CARD_ADD = 2
+EVENT_CARD_UPDATE = 3
+EVENT_CARD_MOVE = 4
+EVENT_CARD_REMOVE = 5
+EVENT_LOG = 6
+EVENT_CARD_COUNT = 7
+
+CARD_ADD = struct.Struct('<IBiiiiI')
+CARD_UPDATE = struct.Struct('<Ii')
+CARD_MOVE = struct.Struct('<IiiiI')
+CARD_COUNT = struct.Struct('<II')
+
+class SaveError(Exception):
+    pass
+
+def pack_text(text):
+    data = text.encode('utf-8')
+    return struct.pack('<H', len(data)) + data
+
+def unpack_text(data, offset):
+    size, = struct.unpack_from('<H', data, offset)
+    offset += 2
+    return data[offset:offset + size].decode('utf-8'), offset + size
+
+def pack_state(game):
+    return STATE.pack(game.health, game.reason, game.funds, game.cult_created,
+                      GAME_STATES.index(game.game_state) if game.game_state in GAME_STATES else 0,
+                      ENDINGS.index(game.current_ending), game.next_uid, game.card_order)
+
+def apply_state(game, data, offset=0):
+    (game.health, game.reason, game.funds, cult_created, state, ending,
+     game.next_uid, game.card_order) = STATE.unpack_from(data, offset)
+    game.cult_created = bool(cult_created)
+    game.game_state = GAME_STATES[state]
+    game.current_ending = ENDINGS[ending]
+    return offset + STATE.size
+
+def make_card(game, uid, card_type, value, x, y, z_index, order, title, description, count=1):
+    card = game.new_card(title, description, CARD_TYPES[card_type], None if value == NO_VALUE else value, x, y)
+    card.uid = uid
+    card.z_index = z_index
+    card.order = order
+    card.count = count
+    return card
+
+def encode_snapshot(game, generation=0):
+    """Все состояние игры одним блоком байт"""
+    strings = {}
+    
+    def string_id(text):
+        index = strings.get(text)
+        if index is None:
+            index = strings[text] = len(strings)
+        return index
+    
+    cards = [CARD.pack(card.uid, CARD_TYPES.index(card.type),
+                       NO_VALUE if card.value is None else card.value,
+                       card.x, card.y, card.z_index, card.order,
+                       string_id(card.title), string_id(card.description), card.count)
+             for card in game.cards]
+    log = [COUNT.pack(string_id(entry)) for entry in game.log_entries]
+    
+    parts = [HEADER.pack(SNAPSHOT_MAGIC, VERSION, generation), pack_state(game), COUNT.pack(len(strings))]
+    parts.extend(pack_text(text) for text in strings)
+    parts.append(COUNT.pack(len(cards)))
+    parts.extend(cards)
+    parts.append(COUNT.pack(len(log)))
+    parts.extend(log)
+    return b''.join(parts)
+
+def decode_snapshot(game, data):
+    """Восстанавливает игру из снимка и возвращает его поколение"""
+    magic, version, generation = HEADER.unpack_from(data)
+    if magic != SNAPSHOT_MAGIC or version not in READABLE_VERSIONS:
+        raise SaveError("Неизвестный формат сохранения")
+    offset = apply_state(game, data, HEADER.size)
+    
+    count, = COUNT.unpack_from(data, offset)
+    offset += COUNT.size
+    strings = []
+    for _ in range(count):
+        text, offset = unpack_text(data, offset)
+        strings.append(text)
+    
+    count, = COUNT.unpack_from(data, offset)
+    offset += COUNT.size
+    card_struct = CARD if version == VERSION else CARD_V1
+    end = offset + count * card_struct.size
+    cards = list(card_struct.iter_unpack(data[offset:end]))
+    offset = end
+    
+    # Карты добавляются разом в порядке отрисовки, чтобы индексы представления строились без пересортировки
+    game.clear_cards()
+    cards.sort(key=lambda card: (card[5], card[6]))
+    game.add_cards([make_card(game, uid, card_type, value, x, y, z_index, order, strings[title], strings[description], *count)
+                    for uid, card_type, value, x, y, z_index, order, title, description, *count in cards])
+    
+    count, = COUNT.unpack_from(data, offset)
+    offset += COUNT.size
+    game.log_entries = deque((strings[index] for index, in COUNT.iter_unpack(data[offset:offset + count * COUNT.size])), LOG_SIZE)
+    return generation
+
+class GameJournal:
+    """Снимок в path и журнал событий в path + '.journal'"""
+    def __init__(self, path, compact_every=1000):
+        self.path = path
+        self.journal_path = path + '.journal'
+        self.compact_every = compact_every
+        self.generation = 0
+        self.events = 0
+        self.end = 0  # конец последней целой записи журнала
+        self.file = None
+        self.paused = False
+    
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+    
+    # Загрузка
+    
+    def load(self, game):
+        """Загружает снимок и журнал в игру. Возвращает False, если сохранения нет"""
+        if not os.path.exists(self.path):
+            return False
+        
+        self.paused = True
+        try:
+            with open(self.path, 'rb') as f:
+                self.generation = decode_snapshot(game, f.read())
+            self.events = self.replay(game)
+        except (struct.error, LookupError, ValueError) as e:
+            raise SaveError(f"Сохранение повреждено: {e}") from e
+        finally:
+            self.paused = False
+        
+        game.update_resources()
+        game.check_cult_creation()
+        self.open_journal()
+        return True
+    
+    def replay(self, game):
+        self.end = 0
+        try:
+            with open(self.journal_path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return 0
+        
+        if len(data) < HEADER.size:
+            return 0
+        magic, version, generation = HEADER.unpack_from(data)
+        if magic != JOURNAL_MAGIC or version not in READABLE_VERSIONS or generation != self.generation:
+            return 0
+        
+        cards = {card.uid: card for card in game.cards}
+        offset = HEADER.size
+        events = 0
+        while offset + RECORD.size <= len(data):
+            kind, size = RECORD.unpack_from(data, offset)
+            start = offset + RECORD.size
+            if start + size > len(data):
+                break  # недописанная запись в конце (игра упала во время записи)
+            self.apply_event(game, cards, kind, data[start:start + size])
+            offset = start + size
+            events += 1
+        self.end = offset
+        return events
+    
+    def apply_event(self, game, cards, kind, payload):
+        if kind == EVENT_STATE:
+            apply_state(game, payload)
+        elif kind == EVENT_CARD_ADD:
+            uid, card_type, value, x, y, z_index, order = CARD_ADD.unpack_from(payload)
+            title, offset = unpack_text(payload, CARD_ADD.size)
+            description, offset = unpack_text(payload, offset)
+            cards[uid] = card = make_card(game, uid, card_type, value, x, y, z_index, order, title, description)
+            game.add_card(card)
+            # Карта, снятая со стопки, и перенос пишутся между действиями, без записи состояния
+            game.next_uid = max(game.next_uid, uid + 1)
+            game.card_order = max(game.card_order, order)
+        elif kind == EVENT_CARD_UPDATE:
+            uid, value = CARD_UPDATE.unpack_from(payload)
+            title, offset = unpack_text(payload, CARD_UPDATE.size)
+            description, offset = unpack_text(payload, offset)
+            card = cards[uid]
+            if (title, description) != (card.title, card.description):
+                game.rename_card(card, title, description)
+            card.value = None if value == NO_VALUE else value
+        elif kind == EVENT_CARD_MOVE:
+            uid, x, y, z_index, order = CARD_MOVE.unpack_from(payload)
+            game.place_card(cards[uid], x, y, z_index, order)
+            game.card_order = max(game.card_order, order)
+        elif kind == EVENT_CARD_REMOVE:
+            uid, = COUNT.unpack_from(payload)
+            game.remove_card(cards.pop(uid))
+        elif kind == EVENT_LOG:
+            game.add_log(unpack_text(payload, 0)[0])
+        elif kind == EVENT_CARD_COUNT:
+            uid, count = CARD_COUNT.unpack_from(payload)
+            game.set_card_count(cards[uid], count)
+    
+    # Запись
+    
+    def open_journal(self):
+        self.close()
+        exists = os.path.exists(self.journal_path) and self.events
+        self.file = open(self.journal_path, 'ab' if exists else 'wb')
+        if exists:
+            # Обрезаем недописанную запись: иначе ее размер проглотит начало новых записей
+            self.file.truncate(self.end)
+        else:
+            self.file.write(HEADER.pack(JOURNAL_MAGIC, VERSION, self.generation))
+            self.file.flush()
+    
+    def compact(self, game):
+        """Пишет новый снимок и начинает журнал заново"""
+        self.close()
+        self.generation += 1
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(encode_snapshot(game, self.generation))
+        os.replace(tmp_path, self.path)
+        self.events = 0
+        self.open_journal()
+    
+    def maybe_compact(self, game):
+        if self.events >= self.compact_every:
+            self.compact(game)
+    
+    def append(self, kind, payload):
+        if self.paused or self.file is None:
+            return
+        self.file.write(RECORD.pack(kind, len(payload)) + payload)
+        self.file.flush()
+        self.events += 1
+    
+    def state_changed(self, game):
+        self.append(EVENT_STATE, pack_state(game))
+    
+    def card_added(self, card):
+        self.append(EVENT_CARD_ADD, CARD_ADD.pack(card.uid, CARD_TYPES.index(card.type),
+                                                  NO_VALUE if card.value is None else card.value,
+                                                  card.x, card.y, card.z_index, card.order)
+                    + pack_text(card.title) + pack_text(card.description))
+    
+    def card_updated(self, card):
+        self.append(EVENT_CARD_UPDATE, CARD_UPDATE.pack(card.uid, NO_VALUE if card.value is None else card.value)
+                    + pack_text(card.title) + pack_text(card.description))
+    
+    def card_count_changed(self, card):
+        self.append(EVENT_CARD_COUNT, CARD_COUNT.pack(card.uid, card.count))
+    
+    def card_moved(self, card):
+        self.append(EVENT_CARD_MOVE, CARD_MOVE.pack(card.uid, card.x, card.y, card.z_index, card.order))
+    
+    def card_removed(self, card):
+        self.append(EVENT_CARD_REMOVE, COUNT.pack(card.uid))
+    
+    def logged(self, text):
+        self.append(EVENT_LOG, pack_text(text))
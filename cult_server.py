@@ -0,0 +1,377 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import secrets
+import struct
+import sys
+import time
+
+from cult_rules import CultRules
+from cult_save import SaveError, decode_snapshot, encode_snapshot
+
+# Сервер партий без окна: много сессий CultRules в одном процессе asyncio.
+# Протокол - строки JSON по TCP, каждый запрос называет свою сессию, поэтому
+# одно соединение может вести сколько угодно партий:
+#
+#   {"op": "open"[, "session": id][, "seed": N]}  -> полное состояние партии
+#   {"op": "action", "session": id, "action": "Работать"}  -> только изменения
+#   {"op": "close", "session": id}
+#
+# Необязательное поле "id" запроса возвращается в ответе. Изменения собирает
+# DiffJournal, подключенный к партии как журнал сохранения (тот же интерфейс,
+# что у cult_save.GameJournal). Сессии без запросов дольше idle_timeout
+# выгружаются на диск: состояние генератора случайности плюс снимок cult_save.
+#
+# Сервер:        python cult_server.py [--port 7777] [--state-dir sessions]
+# Нагрузка:      python cult_server.py --bench [--sessions 10000] [--actions 20]
+
+SESSION_MAGIC = b'CULTSESS'
+SESSION_VERSION = 1
+SESSION_HEADER = struct.Struct('<8sBq')
+SEED_RANGE = range(-2 ** 63, 2 ** 63)  # seed хранится в заголовке как int64
+RNG_STATE = struct.Struct('<625I')  # состояние Mersenne Twister: 624 слова и позиция
+
+SESSION_ID = re.compile(r'[0-9a-f]{1,32}')
+WRITE_BUFFER_LIMIT = 256 * 1024
+
+def card_record(card):
+    return [card.uid, card.type, card.title, card.description, card.value, card.count]
+
+def resources(game):
+    return {"health": game.health, "reason": game.reason, "funds": game.funds}
+
+class DiffJournal:
+    """Журнал партии, который вместо файла копит изменения для следующего ответа"""
+    def __init__(self, game):
+        self.resources = resources(game)
+        self.actions = game.available_actions()
+        self.diff = {}
+    
+    def take(self):
+        diff, self.diff = self.diff, {}
+        return diff
+    
+    def state_changed(self, game):
+        changed = {name: value for name, value in resources(game).items() if self.resources[name] != value}
+        if changed:
+            self.resources.update(changed)
+            self.diff["resources"] = changed
+        actions = game.available_actions()
+        if actions != self.actions:
+            self.actions = self.diff["actions"] = actions
+        if game.game_state == "ending":
+            self.diff["ending"] = game.current_ending
+    
+    def maybe_compact(self, game):
+        pass
+    
+    def card_added(self, card):
+        self.diff.setdefault("cards", []).append(card_record(card))
+    
+    def card_count_changed(self, card):
+        self.diff.setdefault("counts", {})[card.uid] = card.count
+    
+    def card_updated(self, card):
+        self.diff.setdefault("renamed", {})[card.uid] = [card.title, card.description]
+    
+    def card_moved(self, card):
+        pass
+    
+    def card_removed(self, card):
+        self.diff.setdefault("removed", []).append(card.uid)
+    
+    def logged(self, text):
+        self.diff.setdefault("log", []).append(text)
+
+class Session:
+    __slots__ = ('id', 'seed', 'game', 'last_used')
+    
+    def __init__(self, session_id, seed, game):
+        self.id = session_id
+        self.seed = seed
+        self.game = game
+        self.last_used = time.monotonic()
+        game.journal = DiffJournal(game)
+    
+    def full_state(self):
+        game = self.game
+        state = {"session": self.id, "seed": self.seed, "resources": resources(game),
+                 "cards": [card_record(card) for card in game.cards], "log": list(game.log_entries),
+                 "actions": game.available_actions()}
+        if game.game_state == "ending":
+            state["ending"] = game.current_ending
+        return state
+
+def encode_session(session):
+    """Компактная форма выгруженной сессии: seed, состояние генератора и снимок партии"""
+    version, words, gauss = session.game.rng.getstate()
+    return (SESSION_HEADER.pack(SESSION_MAGIC, SESSION_VERSION, session.seed)
+            + RNG_STATE.pack(*words) + encode_snapshot(session.game))
+
+def decode_session(session_id, data):
+    magic, version, seed = SESSION_HEADER.unpack_from(data)
+    if magic != SESSION_MAGIC or version != SESSION_VERSION:
+        raise SaveError("Неизвестный формат сессии")
+    rng = random.Random()
+    rng.setstate((3, RNG_STATE.unpack_from(data, SESSION_HEADER.size), None))
+    game = CultRules(rng)
+    decode_snapshot(game, data[SESSION_HEADER.size + RNG_STATE.size:])
+    game.update_resources()
+    game.check_cult_creation()
+    return Session(session_id, seed, game)
+
+class RequestError(Exception):
+    pass
+
+class GameServer:
+    """Сессии в памяти, выгрузка простаивающих и обработка запросов"""
+    def __init__(self, state_dir="sessions", idle_timeout=300.0, sweep_interval=10.0):
+        self.state_dir = state_dir
+        self.idle_timeout = idle_timeout
+        self.sweep_interval = sweep_interval
+        self.sessions = {}
+        self.evicting = {}  # id -> (сессия, ее байты), пока файл пишется
+        self.actions = 0
+        os.makedirs(state_dir, exist_ok=True)
+    
+    def session_path(self, session_id):
+        return os.path.join(self.state_dir, session_id + ".sess")
+    
+    def get_session(self, session_id):
+        if not isinstance(session_id, str) or not SESSION_ID.fullmatch(session_id):
+            raise RequestError("Неверный идентификатор сессии")
+        session = self.sessions.get(session_id)
+        if session is None:
+            # Выгруженная сессия: из очереди записи (та же партия) или с диска
+            session = self.evicting.get(session_id, (None,))[0]
+            if session is None:
+                try:
+                    with open(self.session_path(session_id), 'rb') as f:
+                        data = f.read()
+                except FileNotFoundError:
+                    raise RequestError("Нет такой сессии") from None
+                try:
+                    session = decode_session(session_id, data)
+                except (struct.error, LookupError, ValueError, SaveError) as e:
+                    raise RequestError(f"Сессия повреждена: {e}") from e
+            self.sessions[session_id] = session
+        session.last_used = time.monotonic()
+        return session
+    
+    def open_session(self, session_id=None, seed=None):
+        if session_id is not None:
+            return self.get_session(session_id)
+        if seed is None:
+            seed = random.getrandbits(63)
+        elif not isinstance(seed, int) or seed not in SEED_RANGE:
+            raise RequestError("seed должен быть целым числом от -2**63 до 2**63-1")
+        session_id = secrets.token_hex(8)
+        session = self.sessions[session_id] = Session(session_id, seed, CultRules(random.Random(seed)))
+        return session
+    
+    def apply(self, session_id, action):
+        """Ход партии по тем же правилам, что CultGame.perform_action; возвращает изменения"""
+        session = self.get_session(session_id)
+        game = session.game
+        if game.game_state == "ending":
+            raise RequestError("Партия окончена")
+        if action not in game.available_actions():
+            raise RequestError(f"Действие недоступно: {action}")
+        game.perform_action(action)
+        self.actions += 1
+        return game.journal.take()
+    
+    def close_session(self, session_id):
+        self.get_session(session_id)
+        del self.sessions[session_id]
+        # Если файл сессии еще пишется, evict удалит его после записи
+        self.evicting.pop(session_id, None)
+        try:
+            os.remove(self.session_path(session_id))
+        except FileNotFoundError:
+            pass
+    
+    def handle_request(self, request):
+        op = request.get("op")
+        if op == "action":
+            reply = self.apply(request.get("session"), request.get("action"))
+        elif op == "open":
+            reply = self.open_session(request.get("session"), request.get("seed")).full_state()
+        elif op == "close":
+            self.close_session(request.get("session"))
+            reply = {}
+        else:
+            raise RequestError(f"Неизвестная операция: {op}")
+        return reply
+    
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise RequestError("Запрос должен быть объектом JSON")
+                    reply = self.handle_request(request)
+                except RequestError as e:
+                    reply = {"error": str(e)}
+                except ValueError:
+                    request = None
+                    reply = {"error": "Неверный JSON"}
+                except Exception as e:
+                    # Ошибка в одном запросе не должна обрывать соединение с другими сессиями
+                    print(f"Ошибка запроса {line[:200]!r}: {e!r}", file=sys.stderr)
+                    reply = {"error": "Внутренняя ошибка сервера"}
+                if isinstance(request, dict) and "id" in request:
+                    reply["id"] = request["id"]
+                writer.write(json.dumps(reply, ensure_ascii=False).encode('utf-8') + b"\n")
+                # Ответы копятся в буфере, ждем отправки только при переполнении
+                if writer.transport.get_write_buffer_size() > WRITE_BUFFER_LIMIT:
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+    
+    async def evict_idle(self):
+        """Периодически выгружает на диск сессии, простаивающие дольше idle_timeout"""
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await self.evict(time.monotonic() - self.idle_timeout)
+            except Exception as e:
+                # Сессии, которые не удалось выгрузить, остаются в памяти до следующего раза
+                print(f"Ошибка выгрузки сессий: {e!r}", file=sys.stderr)
+    
+    async def evict(self, before):
+        idle = [session for session in self.sessions.values() if session.last_used < before]
+        if not idle:
+            return
+        batch = {}
+        for session in idle:
+            # Сессия убирается из памяти, только когда ее байты готовы
+            try:
+                data = encode_session(session)
+            except Exception as e:
+                print(f"Сессия {session.id} не выгружена: {e!r}", file=sys.stderr)
+                continue
+            del self.sessions[session.id]
+            batch[session.id] = self.evicting[session.id] = (session, data)
+        # Файлы пишутся в отдельном потоке; пока запись идет, сессия берется из evicting
+        failed = await asyncio.to_thread(self.write_sessions, batch)
+        for session_id, entry in batch.items():
+            if self.evicting.get(session_id) is entry:
+                del self.evicting[session_id]
+                if session_id in failed:
+                    self.sessions[session_id] = entry[0]
+            elif session_id not in self.evicting and session_id not in self.sessions:
+                # Сессию закрыли, пока файл писался: файл записан уже после удаления
+                try:
+                    os.remove(self.session_path(session_id))
+                except FileNotFoundError:
+                    pass
+    
+    def write_sessions(self, batch):
+        """Пишет файлы сессий; возвращает идентификаторы тех, что записать не удалось"""
+        failed = set()
+        for session_id, (session, data) in batch.items():
+            path = self.session_path(session_id)
+            try:
+                with open(path + '.tmp', 'wb') as f:
+                    f.write(data)
+                os.replace(path + '.tmp', path)
+            except OSError as e:
+                print(f"Сессия {session_id} не записана: {e}", file=sys.stderr)
+                failed.add(session_id)
+        return failed
+    
+    async def serve(self, host="127.0.0.1", port=7777):
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        sweeper = asyncio.create_task(self.evict_idle())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            sweeper.cancel()
+
+async def bench_client(port, sessions, actions, latencies, seed):
+    """Один клиент: открывает сессии и ходит случайными доступными действиями"""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    rng = random.Random(seed)
+    
+    async def call(request):
+        start = time.perf_counter()
+        writer.write(json.dumps(request, ensure_ascii=False).encode('utf-8') + b"\n")
+        reply = json.loads(await reader.readline())
+        latencies.append(time.perf_counter() - start)
+        return reply
+    
+    games = []
+    for _ in range(sessions):
+        state = await call({"op": "open", "seed": rng.getrandbits(32)})
+        games.append([state["session"], state["actions"], False])
+    for _ in range(actions):
+        for game in games:
+            session_id, available, ended = game
+            if ended:
+                state = await call({"op": "open", "seed": rng.getrandbits(32)})
+                game[:] = [state["session"], state["actions"], False]
+                continue
+            diff = await call({"op": "action", "session": session_id, "action": rng.choice(available)})
+            if "error" in diff:
+                raise RuntimeError(diff["error"])
+            game[1] = diff.get("actions", available)
+            game[2] = "ending" in diff
+    writer.close()
+
+async def bench(sessions, actions, connections, state_dir):
+    server = GameServer(state_dir, idle_timeout=0.5, sweep_interval=0.5)
+    listener = await asyncio.start_server(server.handle_connection, "127.0.0.1", 0)
+    port = listener.sockets[0].getsockname()[1]
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*[bench_client(port, sessions // connections, actions, latencies, i)
+                           for i in range(connections)])
+    elapsed = time.perf_counter() - start
+    
+    latencies.sort()
+    p = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1e6
+    print(f"{len(latencies)} запросов ({server.actions} ходов) за {elapsed:.2f} с: "
+          f"{len(latencies) / elapsed:.0f} в секунду, сессий в памяти {len(server.sessions)}")
+    print(f"задержка p50 {p(0.5):.0f} мкс, p99 {p(0.99):.0f} мкс (клиенты в том же процессе)")
+    
+    # Выгрузка: все сессии простаивают, их форма на диске
+    start = time.perf_counter()
+    count = len(server.sessions)
+    await server.evict(time.monotonic())
+    elapsed = time.perf_counter() - start
+    size = sum(os.path.getsize(os.path.join(state_dir, name)) for name in os.listdir(state_dir))
+    print(f"выгружено {count} сессий за {elapsed:.2f} с, в среднем {size / max(1, count):.0f} байт на сессию")
+    listener.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Сервер партий Тайного Культа")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7777)
+    parser.add_argument("--state-dir", default="sessions", help="куда выгружать простаивающие сессии")
+    parser.add_argument("--idle-timeout", type=float, default=300.0, help="секунд без запросов до выгрузки")
+    parser.add_argument("--bench", action="store_true", help="нагрузочный прогон по loopback вместо сервера")
+    parser.add_argument("--sessions", type=int, default=10000)
+    parser.add_argument("--actions", type=int, default=20, help="ходов на сессию")
+    parser.add_argument("--connections", type=int, default=4)
+    args = parser.parse_args()
+    
+    if args.bench:
+        asyncio.run(bench(args.sessions, args.actions, args.connections, args.state_dir))
+    else:
+        server = GameServer(args.state_dir, args.idle_timeout)
+        print(f"Сервер на {args.host}:{args.port}, сессии выгружаются в {args.state_dir}")
+        asyncio.run(server.serve(args.host, args.port))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,484 @@
+import argparse
+import time
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+
+from cult_policies import OUTCOMES
+from cult_rules import ACTIONS, ENDINGS
+
+# Точные вероятности концовок вместо миллионов партий Монте-Карло.
+#
+# Для правил важны только ресурсы и количество карт по типам, причем большие
+# количества неотличимы: знаний больше 3, последователей больше 5 и храмов
+# больше 3 правила не различают, а 7 видений - это уже концовка. Деньги растут
+# без ограничения, поэтому выше max_funds они считаются равными max_funds
+# (для стратегий, которые столько не копят, результат точный).
+#
+# Карты не пропадают, поэтому состояние делится на "слои" по набору карт, и из
+# слоя можно перейти только в слой с большим числом карт. Значения слоя - это
+# массивы по (здоровье, рассудок, деньги); они считаются через значения
+# следующих слоев (мемоизированная рекурсия) и итерациями внутри слоя: внутри
+# бывают циклы, например "Работать" - "Отдых" - "Исследовать" на полном
+# здоровье. Готовые слои хранятся в LRU-кэше, его размер ограничивает память.
+#
+# Ветки действий повторяют CultRules.apply_action, при изменении правил их
+# нужно править в обоих местах (и в cult_batch).
+
+WORK, STUDY, DREAM, TALK, EXPLORE, REST, RITUAL, CREATE_CULT = range(len(ACTIONS))
+
+MAX_LORE = 3
+MAX_FOLLOWERS = 5
+MAX_LOCATIONS = 3
+MADNESS_ASPECTS = 7
+
+ENDING_NAMES = list(ENDINGS)  # концовки без NONE
+TURNS = len(ENDING_NAMES)  # номер строки со средней длиной партии в значениях слоя
+NEVER = 1e12  # "бесконечное" число ходов там, где inf дал бы 0 * inf = nan
+
+Layer = namedtuple('Layer', 'cult lore ancient follower aspect location')
+
+START_LAYER = Layer(False, 1, False, 1, 0, 0)  # "Старая книга" и "Таинственный незнакомец"
+START_CELL = (10, 10, 5)  # здоровье, рассудок, деньги
+
+def ritual_ending(layer):
+    """Концовка, которую дает ритуал в этом слое (как CultRules.perform_ritual_check)"""
+    if not layer.cult:
+        return None
+    if layer.lore >= 3 and layer.follower >= 2:
+        return "ASCENSION"
+    if layer.aspect >= 5:
+        return "MADNESS"
+    if layer.follower >= 5:
+        return "CULT_LEADER"
+    if layer.location >= 3:
+        return "FORGOTTEN"
+    return None
+
+def can_create_cult(layer):
+    return layer.ancient and layer.follower > 0 and not layer.cult
+
+def layer_of(game):
+    return Layer(game.cult_created, min(game.count_cards('lore'), MAX_LORE), game.ancient_knowledge > 0,
+                 min(game.count_cards('follower'), MAX_FOLLOWERS), game.count_cards('aspect'),
+                 min(game.count_cards('location'), MAX_LOCATIONS))
+
+def finite(values):
+    # Бесконечные ходы (партия может не закончиться) не должны давать 0 * inf = nan
+    return np.minimum(values, NEVER)
+
+class Grid:
+    """Клетки (здоровье, рассудок, деньги) одного слоя и ходы по ним"""
+    def __init__(self, max_funds):
+        self.max_funds = max_funds
+        self.shape = (11, 11, max_funds + 1)
+        self.size = 11 * 11 * (max_funds + 1)
+        self.health, self.reason, self.funds = np.indices(self.shape)
+        self.cells = np.arange(self.size).reshape(self.shape)
+        # Рассудок 0 - безумие, здоровье 0 - забвение (правила до него не доводят)
+        self.madness = (self.reason == 0).ravel()
+        self.forgotten = ((self.health == 0) & (self.reason > 0)).ravel()
+        self.terminal = self.madness | self.forgotten
+        
+        h, r, f = self.health, self.reason, self.funds
+        cell = self.cell
+        # Для каждого действия: где оно удается и в какую клетку ведет
+        self.moves = {
+            WORK: (h > 2, cell(h - 1, r, np.minimum(f + 2, max_funds))),
+            STUDY: (r > 1, cell(h, r - 1, f)),
+            DREAM: (r > 0, cell(h, r - 1, f)),
+            TALK: (np.ones(self.shape, dtype=bool), self.cells),
+            EXPLORE: (f > 0, cell(h, r, f - 1)),
+            REST: (f > 0, cell(np.minimum(h + 2, 10), np.minimum(r + 1, 10), f - 1)),
+            RITUAL: ((h > 1) & (r > 1), cell(h - 1, r - 1, f)),
+            CREATE_CULT: (np.ones(self.shape, dtype=bool), self.cells),
+        }
+        self.moves = {action: (ok.ravel(), np.where(ok, target, self.cells).ravel())
+                      for action, (ok, target) in self.moves.items()}
+    
+    def cell(self, h, r, f):
+        return np.ravel_multi_index((np.clip(h, 0, 10), np.clip(r, 0, 10), np.clip(f, 0, self.max_funds)), self.shape)
+    
+    def index(self, health, reason, funds):
+        return int(self.cells[health, reason, min(funds, self.max_funds)])
+
+def card_branch(layer, action):
+    """Вероятность новой карты и слой после нее (None - концовка БЕЗУМИЕ)"""
+    if action == WORK:
+        return 0.2, layer._replace(follower=min(layer.follower + 1, MAX_FOLLOWERS))
+    if action == STUDY:
+        return 0.3, layer._replace(lore=min(layer.lore + 1, MAX_LORE), ancient=True)
+    if action == DREAM:
+        if layer.aspect + 1 >= MADNESS_ASPECTS:
+            return 0.3, None
+        return 0.3, layer._replace(aspect=layer.aspect + 1)
+    if action == TALK:
+        return 0.5, layer._replace(follower=min(layer.follower + 1, MAX_FOLLOWERS))
+    if action == EXPLORE:
+        return 0.4, layer._replace(location=min(layer.location + 1, MAX_LOCATIONS))
+    if action == RITUAL:
+        return 0.2, layer._replace(lore=min(layer.lore + 1, MAX_LORE))
+    if action == CREATE_CULT:
+        return 1.0, layer._replace(cult=True)
+    return 0.0, layer
+
+# Стратегии для решателя: policy(layer, health, reason, funds) -> массив
+# номеров действий по клеткам или веса действий формы (len(ACTIONS), клетки).
+# Это векторные копии стратегий из cult_policies.
+
+def available(layer, shape):
+    """Веса равновероятного выбора видимой кнопки"""
+    weights = np.zeros((len(ACTIONS),) + shape)
+    visible = list(range(6))
+    if layer.cult:
+        visible.append(RITUAL)
+    elif layer.ancient and layer.follower:
+        visible.append(CREATE_CULT)
+    weights[visible] = 1.0 / len(visible)
+    return weights
+
+def random_policy(layer, health, reason, funds):
+    return available(layer, health.shape)
+
+def work_then_study(layer, health, reason, funds):
+    if can_create_cult(layer):
+        return np.full(health.shape, CREATE_CULT)
+    if ritual_ending(layer):
+        return np.full(health.shape, RITUAL)
+    tired = (health <= 3) | (reason <= 2)
+    return np.select([tired & (funds > 0), tired, funds < 5], [REST, WORK, WORK], STUDY)
+
+def dream_rush(layer, health, reason, funds):
+    return np.full(health.shape, DREAM)
+
+def gather_followers(layer, health, reason, funds):
+    if can_create_cult(layer):
+        return np.full(health.shape, CREATE_CULT)
+    if layer.cult and layer.follower >= 5:
+        return np.full(health.shape, RITUAL)
+    if not layer.ancient and layer.follower >= 2:
+        return np.select([reason > 2, funds > 0], [STUDY, REST], WORK)
+    return np.full(health.shape, TALK)
+
+POLICIES = {
+    "random": random_policy,
+    "work_then_study": work_then_study,
+    "dream_rush": dream_rush,
+    "followers": gather_followers,
+}
+
+class Solution:
+    """Вероятности концовок и средняя длина партии из начального состояния"""
+    def __init__(self, probabilities, turns, layers, elapsed, choices=None, grid=None):
+        self.probabilities = probabilities  # концовка -> вероятность, включая NONE
+        self.turns = turns  # inf, если партия может не закончиться
+        self.layers = layers  # сколько раз решался слой (с учетом вытеснения из кэша)
+        self.elapsed = elapsed
+        self.choices = choices  # для оптимальной стратегии: слой -> номер действия по клеткам
+        self.grid = grid
+    
+    def action(self, game):
+        """Действие оптимальной стратегии для партии CultRules"""
+        cell = self.grid.index(game.health, game.reason, game.funds)
+        return ACTIONS[self.choices[layer_of(game)][cell]]
+
+class Solver:
+    """Решатель над сжатым пространством состояний
+    
+    cache_size - сколько слоев держать в памяти одновременно. Слой занимает
+    (len(ENDINGS) + 1) * 121 * (max_funds + 1) * 8 байт, около 150 КБ при
+    max_funds=30, то есть по умолчанию до 40 МБ. Вытесненный слой при
+    повторной нужде считается заново.
+    """
+    def __init__(self, max_funds=30, cache_size=256, tolerance=1e-10, max_iterations=100000):
+        self.grid = Grid(max_funds)
+        self.cache_size = cache_size
+        self.tolerance = tolerance
+        self.max_iterations = max_iterations
+        self.solved_layers = 0
+    
+    def terminal_values(self, ending=None):
+        """Значения слоя, где каждая клетка - концовка ending (или концовки по рассудку)"""
+        values = np.zeros((TURNS + 1, self.grid.size))
+        if ending is not None:
+            values[ENDING_NAMES.index(ending)] = 1.0
+            return values
+        values[ENDING_NAMES.index("MADNESS"), self.grid.madness] = 1.0
+        values[ENDING_NAMES.index("FORGOTTEN"), self.grid.forgotten] = 1.0
+        return values
+    
+    def converge(self, update, values):
+        for _ in range(self.max_iterations):
+            new = update(values)
+            if np.abs(new - values).max(initial=0.0) < self.tolerance:
+                return new, True
+            values = new
+        return values, False
+    
+    def solve_layer(self, layer, weights, values_of):
+        """Значения слоя для стратегии с весами действий weights (действие, клетка)
+        
+        values_of(слой) - значения следующих слоев. Возвращает массив
+        (концовки + ходы, клетки).
+        """
+        grid = self.grid
+        self.solved_layers += 1
+        live = ~grid.terminal
+        constant = self.terminal_values()  # вклад переходов в уже решенные слои
+        constant[TURNS, live] = 1.0
+        stay = np.zeros(grid.size)  # вероятность остаться в той же клетке
+        moves = []  # (веса, клетка) переходов внутри слоя
+        
+        for action in range(len(ACTIONS)):
+            weight = weights[action] * live
+            if not weight.any():
+                continue
+            if action == RITUAL and ritual_ending(layer):
+                constant[ENDING_NAMES.index(ritual_ending(layer))] += weight
+                continue
+            ok, target = grid.moves[action]
+            if action == RITUAL and not layer.cult or action == CREATE_CULT and not can_create_cult(layer):
+                ok = np.zeros_like(ok)
+            stay += weight * ~ok
+            weight = weight * ok
+            
+            p, successor = card_branch(layer, action)
+            if successor == layer:
+                p = 0.0  # карта есть, но слой от нее не меняется (счетчик уже на пределе)
+            if p:
+                after = self.terminal_values("MADNESS") if successor is None else values_of(successor)
+                constant += weight * p * finite(after[:, target])
+            internal = weight * (1.0 - p)
+            same = target == grid.cells.ravel()
+            stay += internal * same
+            moves.append((internal * ~same, target))
+        
+        # Петли на месте решаются сразу: V = (C + сумма w * V[t]) / (1 - stay)
+        stuck = stay >= 1.0 - 1e-15
+        scale = np.where(stuck, 0.0, 1.0 / np.where(stuck, 1.0, 1.0 - stay))
+        constant *= scale
+        # Переходы всех действий складываются в общие массивы (переход, клетка), причем
+        # ненулевые сдвигаются наверх: для чистой стратегии остается одна строка
+        weight = np.array([weight for weight, _ in moves]).reshape(-1, grid.size) * scale
+        target = np.array([target for _, target in moves], dtype=np.intp).reshape(-1, grid.size)
+        order = np.argsort(weight == 0, axis=0, kind='stable')
+        used = int((weight != 0).sum(axis=0).max(initial=0))
+        weight = np.take_along_axis(weight, order, axis=0)[:used]
+        target = np.take_along_axis(target, order, axis=0)[:used]
+        
+        if used <= 1:
+            values = self.jump(constant, weight.reshape(-1), target.reshape(-1) if used else grid.cells.ravel())
+        else:
+            def update(values, rows):
+                return constant[rows] + (values[..., target] * weight).sum(axis=-2)
+            
+            # Сначала вероятности концовок, потом ходы: в клетках, где партия может
+            # не закончиться, ходы растут без конца и итерации бы не сошлись
+            values = self.terminal_values()
+            values[:TURNS], _ = self.converge(lambda v: update(v, slice(0, TURNS)), values[:TURNS])
+            finished = values[:TURNS].sum(axis=0) >= 1.0 - 1e-6
+            values[TURNS], _ = self.converge(lambda t: update(t, TURNS) * finished, values[TURNS])
+        # Ходы конечны только там, где партия заканчивается наверняка (с точностью итераций)
+        values[TURNS, values[:TURNS].sum(axis=0) < 1.0 - 1e-6] = np.inf
+        return values
+    
+    def jump(self, constant, weight, target):
+        """V = C + w * V[t] для стратегии, где из клетки один переход внутри слоя
+        
+        Удвоение шагов: после k удвоений C учитывает 2**k ходов, поэтому хватает
+        нескольких десятков операций вместо сотен итераций.
+        """
+        if not len(weight):
+            return constant
+        values = constant
+        for _ in range(64):
+            if weight.max() < self.tolerance:
+                break
+            values = values + weight * values[:, target]
+            weight = weight * weight[target]
+            target = target[target]
+        return values
+    
+    def solve(self, policy):
+        """Вероятности концовок для стратегии policy (функция или имя из POLICIES)"""
+        policy = POLICIES.get(policy, policy)
+        grid = self.grid
+        
+        def weights_of(layer):
+            chosen = policy(layer, grid.health, grid.reason, grid.funds)
+            if chosen.ndim == len(grid.shape):
+                return self.one_hot(chosen.ravel())
+            return chosen.reshape(len(ACTIONS), grid.size)
+        
+        @lru_cache(maxsize=self.cache_size)
+        def values_of(layer):
+            return self.solve_layer(layer, weights_of(layer), values_of)
+        
+        def actions_of(layer):
+            return np.flatnonzero((weights_of(layer) * ~grid.terminal).any(axis=1))
+        
+        return self.result(values_of, actions_of)
+    
+    def solve_optimal(self, target):
+        """Стратегия, которая чаще всего приводит к концовке target
+        
+        Из равных по вероятности действий выбирается то, что быстрее заканчивает
+        партию, иначе оптимальная стратегия могла бы бесконечно "беседовать".
+        """
+        start = time.perf_counter()
+        grid = self.grid
+        target_row = ENDING_NAMES.index(target)
+        choices = {}
+        
+        @lru_cache(maxsize=self.cache_size)
+        def best_of(layer):
+            choices[layer] = self.choose(layer, target_row, best_of)
+            return self.solve_layer(layer, self.one_hot(choices[layer]), best_of)
+        
+        solution = self.result(best_of, lambda layer: range(len(ACTIONS)))
+        solution.choices = choices
+        solution.grid = grid
+        solution.elapsed = time.perf_counter() - start
+        return solution
+    
+    def one_hot(self, codes):
+        return (codes == np.arange(len(ACTIONS))[:, None]).astype(float)
+    
+    def choose(self, layer, target_row, values_of):
+        """Номер лучшего действия в каждой клетке слоя"""
+        grid = self.grid
+        live = ~grid.terminal
+        visible = available(layer, (grid.size,)) > 0
+        # Для каждого действия: q = постоянная часть + сумма w * V[t] по двум переходам
+        # внутри слоя (неудача - на месте, удача без новой карты - в клетку target),
+        # отдельно для вероятности target (строка 0) и для числа ходов (строка 1)
+        constant = np.zeros((len(ACTIONS), 2, grid.size))
+        constant[:, 0] = -np.inf  # невидимые кнопки
+        constant[:, 1] = np.inf
+        weight = np.zeros((len(ACTIONS), 2, grid.size))
+        target = np.tile(grid.cells.ravel(), (len(ACTIONS), 2, 1))
+        for action in range(len(ACTIONS)):
+            if not visible[action].any():
+                continue
+            if action == RITUAL and ritual_ending(layer):
+                constant[action] = [[ENDING_NAMES.index(ritual_ending(layer)) == target_row], [1.0]]
+                continue
+            constant[action] = [[0.0], [1.0]]
+            ok, target[action, 1] = grid.moves[action]
+            if action == RITUAL and not layer.cult or action == CREATE_CULT and not can_create_cult(layer):
+                ok = np.zeros_like(ok)
+            p, successor = card_branch(layer, action)
+            if successor == layer:
+                p = 0.0
+            if p:
+                after = self.terminal_values("MADNESS") if successor is None else values_of(successor)
+                constant[action, 0] += ok * p * after[target_row, target[action, 1]]
+                constant[action, 1] += ok * p * finite(after[TURNS, target[action, 1]])
+            weight[action, 0] = ~ok
+            weight[action, 1] = ok * (1.0 - p)
+        
+        # Концовки по рассудку - постоянные значения без переходов
+        constant[:, 0, grid.terminal] = self.terminal_values()[target_row, grid.terminal]
+        constant[:, 1, grid.terminal] = 0.0
+        weight[:, :, grid.terminal] = 0.0
+        cells = np.arange(grid.size)
+        
+        def q_values(values, row):
+            return constant[:, row] + (values[row][target] * weight).sum(axis=1)
+        
+        def evaluate(codes):
+            # (вероятность target, ходы) чистой стратегии codes
+            stay = weight[codes, 0, cells]
+            stuck = stay >= 1.0 - 1e-15
+            scale = np.where(stuck, 0.0, 1.0 / np.where(stuck, 1.0, 1.0 - stay))
+            values = self.jump(constant[codes, :, cells].T * scale, weight[codes, 1, cells] * scale,
+                               target[codes, 1, cells])
+            values[1, stuck] = NEVER
+            return values
+        
+        def improve(codes, row, sign):
+            # Улучшение стратегии: действие меняется только там, где другое строго лучше
+            for _ in range(100):
+                values = evaluate(codes)
+                q = q_values(values, row) * sign
+                best = q.argmax(axis=0)
+                changed = live & (q[best, cells] - q[codes, cells] > 1e-9)
+                if not changed.any():
+                    break
+                codes[changed] = best[changed]
+            return values, q * sign
+        
+        # Начальная стратегия "Сны" всегда заканчивает партию (рассудок убывает)
+        codes = np.full(grid.size, DREAM)
+        values, q = improve(codes, 0, 1.0)
+        # Среди действий с лучшей вероятностью - минимум ожидаемых ходов
+        constant[:, 1][q < values[0] - 1e-9] = np.inf
+        improve(codes, 1, -1.0)
+        return codes
+    
+    def reachable_layers(self, actions_of):
+        """Слои, достижимые из начального, если в слое делаются действия actions_of(слой)
+        
+        Следующие слои идут раньше предыдущих.
+        """
+        seen = {START_LAYER}
+        stack = [START_LAYER]
+        while stack:
+            layer = stack.pop()
+            for action in actions_of(layer):
+                if action == RITUAL and not layer.cult or action == CREATE_CULT and not can_create_cult(layer):
+                    continue
+                _, successor = card_branch(layer, action)
+                if successor is not None and successor not in seen:
+                    seen.add(successor)
+                    stack.append(successor)
+        # Видения - внешний ключ: их значений больше всего, поэтому слой и его
+        # следующий слой в этом порядке отстоят друг от друга меньше всего
+        return sorted(seen, key=lambda layer: (layer.aspect, layer.follower, layer.location,
+                                               layer.lore, layer.ancient, layer.cult), reverse=True)
+    
+    def result(self, values_of, actions_of):
+        start = time.perf_counter()
+        self.solved_layers = 0
+        layers = self.reachable_layers(actions_of)
+        if self.cache_size < len(layers):
+            # Все слои в кэш не помещаются: рекурсия от начального слоя решала бы
+            # вытесненные слои снова и снова, поэтому слои решаются снизу вверх, и
+            # следующие слои еще лежат в кэше, когда они нужны. Для этого кэш должен
+            # вмещать около двух сотен слоев, иначе слои все равно решаются повторно
+            for layer in layers:
+                values_of(layer)
+        values = values_of(START_LAYER)[:, self.grid.index(*START_CELL)]
+        probabilities = {name: float(values[i]) for i, name in enumerate(ENDING_NAMES)}
+        probabilities["NONE"] = max(0.0, 1.0 - sum(probabilities.values()))
+        return Solution(probabilities, float(values[TURNS]), self.solved_layers, time.perf_counter() - start)
+
+def print_solution(name, solution):
+    turns = "бесконечна" if solution.turns == np.inf else f"{solution.turns:.2f} ходов"
+    print(f"{name}: {solution.layers} слоев за {solution.elapsed * 1000:.0f} мс, средняя длина {turns}")
+    for ending in OUTCOMES:
+        print(f"    {ending:12} {solution.probabilities[ending]:9.4%}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Точные вероятности концовок")
+    parser.add_argument("policies", nargs="*", help=f"стратегии: {', '.join(POLICIES)} (по умолчанию все)")
+    parser.add_argument("--optimal", choices=ENDING_NAMES, action="append", default=[],
+                        help="найти стратегию, которая чаще всего ведет к концовке")
+    parser.add_argument("--max-funds", type=int, default=30)
+    parser.add_argument("--cache-size", type=int, default=256, help="слоев в памяти")
+    args = parser.parse_args()
+    if not args.policies and not args.optimal:
+        args.policies = list(POLICIES)
+    unknown = [name for name in args.policies if name not in POLICIES]
+    if unknown:
+        parser.error(f"неизвестные стратегии: {', '.join(unknown)}")
+    
+    solver = Solver(args.max_funds, args.cache_size)
+    for name in args.policies:
+        print_solution(name, solver.solve(name))
+    for target in args.optimal:
+        print_solution(f"лучшая для {target}", solver.solve_optimal(target))
+
+if __name__ == "__main__":
+    main()
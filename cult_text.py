@@ -0,0 +1,171 @@
+import weakref
+from collections import OrderedDict
+
+import pygame
+
+# Вывод текста без font.render на каждую строку каждого кадра.
+#
+# Режим "atlas": каждый глиф шрифта рисуется один раз на страницу атласа (своя
+# для каждого цвета), строка выводится как набор кусков атласа, а блок строк -
+# одним вызовом Surface.blits. Ширина текста считается по закешированной ширине
+# глифов, поэтому перенос строк не измеряет одни и те же префиксы снова и снова.
+#
+# Режим "cache": обычный font.render, но готовые строки хранятся в LRU-кеше.
+#
+# Кернинг при сборке строки из глифов не учитывается: строка с парами вроде
+# "AV" выходит на пару пикселей шире, чем у font.render. Перенос строк считает
+# ту же ширину, что и вывод атласом.
+
+MODES = ("atlas", "cache")
+DEFAULT_MODE = "atlas"
+ATLAS_SIZE = 512  # сторона страницы атласа
+CACHE_SIZE = 512  # строк в LRU-кеше режима "cache"
+LAYOUT_CACHE_SIZE = 2048  # раскладок строк на атлас
+
+class GlyphAtlas:
+    """Глифы одного шрифта и цвета на общих страницах"""
+    def __init__(self, font, color):
+        self.font = font
+        self.color = color
+        self.glyphs = {}  # символ -> (страница, прямоугольник на ней) или None для пустых глифов
+        self.pages = []
+        # Место для следующего глифа: ряды одной высоты ("полки") сверху вниз
+        self.x = self.y = self.row_height = 0
+    
+    def glyph(self, char):
+        if char in self.glyphs:
+            return self.glyphs[char]
+        if not self.font.size(char)[0]:
+            # Глифы нулевой ширины (например, селектор варианта эмодзи) font.render не рисует
+            self.glyphs[char] = None
+            return None
+        image = self.font.render(char, True, self.color)
+        width, height = image.get_size()
+        
+        if self.x + width > ATLAS_SIZE:
+            self.x = 0
+            self.y += self.row_height
+            self.row_height = 0
+        if not self.pages or self.y + height > ATLAS_SIZE:
+            self.pages.append(pygame.Surface((ATLAS_SIZE, ATLAS_SIZE), pygame.SRCALPHA))
+            self.x = self.y = self.row_height = 0
+        
+        # BLEND_RGBA_MAX на прозрачную страницу - копия пикселей глифа вместе с альфой
+        page = self.pages[-1]
+        page.blit(image, (self.x, self.y), special_flags=pygame.BLEND_RGBA_MAX)
+        entry = self.glyphs[char] = (page, pygame.Rect(self.x, self.y, width, height))
+        self.x += width
+        self.row_height = max(self.row_height, height)
+        return entry
+
+class TextRenderer:
+    """Размеры, перенос и вывод текста одного шрифта"""
+    def __init__(self, font, mode=DEFAULT_MODE, cache_size=CACHE_SIZE):
+        if mode not in MODES:
+            raise ValueError(f"Неизвестный режим текста: {mode}")
+        self.font = font
+        self.mode = mode
+        self.height = font.get_height()
+        self.advances = {}  # ширина глифов
+        self.atlases = {}  # цвет -> GlyphAtlas
+        self.layouts = {}  # (строка, цвет) -> [(страница, сдвиг x, прямоугольник)]
+        self.cache = OrderedDict()  # (строка, цвет) -> Surface, режим "cache"
+        self.cache_size = cache_size
+    
+    def advance(self, char):
+        # Смещение пера после глифа; для символов, которых нет в шрифте, - ширина по font.size
+        width = self.advances.get(char)
+        if width is None:
+            width = self.font.size(char)[0]
+            metrics = self.font.metrics(char)[0]
+            if width and metrics:
+                width = metrics[4]
+            self.advances[char] = width
+        return width
+    
+    def width(self, text):
+        advances = self.advances
+        width = 0
+        for char in text:
+            step = advances.get(char)
+            width += step if step is not None else self.advance(char)
+        return width
+    
+    def size(self, text):
+        return self.width(text), self.height
+    
+    def wrap(self, text, max_width):
+        """Перенос по словам: слово шире max_width остается на своей строке"""
+        space = self.advance(' ')
+        lines = []
+        current_line = []
+        current_width = 0
+        for word in text.split():
+            word_width = self.width(word)
+            if current_line and current_width + space + word_width > max_width:
+                lines.append(' '.join(current_line))
+                current_line = []
+            if current_line:
+                current_width += space + word_width
+            else:
+                current_width = word_width
+            current_line.append(word)
+        if current_line:
+            lines.append(' '.join(current_line))
+        return lines
+    
+    def layout(self, text, color):
+        # Куски атласа для строки: считаются один раз на строку и цвет
+        key = (text, color)
+        layout = self.layouts.get(key)
+        if layout is None:
+            atlas = self.atlases.get(color)
+            if atlas is None:
+                atlas = self.atlases[color] = GlyphAtlas(self.font, color)
+            layout = []
+            x = 0
+            for char in text:
+                glyph = atlas.glyph(char)
+                if glyph:
+                    layout.append((glyph[0], x, glyph[1]))
+                x += self.advance(char)
+            if len(self.layouts) >= LAYOUT_CACHE_SIZE:
+                self.layouts.clear()
+            self.layouts[key] = layout
+        return layout
+    
+    def render(self, text, color):
+        """Готовая картинка строки из LRU-кеша"""
+        key = (text, color)
+        surface = self.cache.get(key)
+        if surface is None:
+            surface = self.cache[key] = self.font.render(text, True, color)
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        else:
+            self.cache.move_to_end(key)
+        return surface
+    
+    def draw_lines(self, surface, lines, pos, color, line_height):
+        """Выводит строки друг под другом одним Surface.blits"""
+        x, y = pos
+        if self.mode == "cache":
+            blits = [(self.render(line, color), (x, y + i * line_height)) for i, line in enumerate(lines) if line]
+        else:
+            blits = []
+            for line in lines:
+                blits.extend((page, (x + dx, y), rect) for page, dx, rect in self.layout(line, color))
+                y += line_height
+        surface.blits(blits, doreturn=False)
+    
+    def draw(self, surface, text, pos, color):
+        self.draw_lines(surface, (text,), pos, color, 0)
+
+renderers = weakref.WeakKeyDictionary()  # шрифт -> TextRenderer
+
+def text_renderer(font, mode=None):
+    """Общий TextRenderer для шрифта (режим задается при первом обращении)"""
+    renderer = renderers.get(font)
+    if renderer is None:
+        renderer = renderers[font] = TextRenderer(font, mode or DEFAULT_MODE)
+    return renderer
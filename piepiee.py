@@ -1,9 +1,15 @@
+import argparse
 import pygame
 import random
 import math
-
-# Инициализация Pygame
-pygame.init()
+import time
+from cult_log import EventLog
+from cult_metrics import GameMetrics, MetricsExporter
+from cult_profiler import FrameProfiler
+from cult_replay import SessionRecorder
+from cult_rules import ACTIONS, CultRules
+from cult_save import GameJournal, SaveError
+from cult_text import text_renderer
 
 # Размеры для Trinket
 SCREEN_WIDTH = 800
@@ -12,6 +18,15 @@ CARD_WIDTH = 120
 CARD_HEIGHT = 160
 PANEL_WIDTH = 180
 FPS = 60
+IDLE_WAIT = True  # Без ввода спать в pygame.event.wait, а не рисовать 60 кадров в секунду
+IDLE_TIMEOUT = 1000  # мс: самое долгое ожидание ввода в простое
+ACTIVE_FRAMES = 15  # Кадров с полной частотой после последнего ввода (переходы подсветки)
+DIRTY_RECTS = False  # Перерисовывать только изменившиеся области экрана
+SAVE_PATH = "cult_save.bin"  # Файл сохранения (None - не сохранять)
+LOG_DIR = "cult_log"  # Вся история журнала событий (None - только последние записи в памяти)
+LOG_LINES = 4  # Строк журнала на экране
+LOG_RECT = pygame.Rect(10, SCREEN_HEIGHT - 100, SCREEN_WIDTH - PANEL_WIDTH - 20, 90)  # Рамка журнала
+TEXT_MODE = "atlas"  # Вывод текста: "atlas" - атлас глифов, "cache" - LRU-кеш готовых строк
 
 # Цвета
 BLACK = (26, 26, 26)
@@ -24,7 +39,54 @@ PURPLE = (75, 0, 130)
 ORANGE = (255, 140, 0)
 BLUE = (30, 144, 255)
 
+# Карта при наведении и ее тень
+HOVER_SCALE = 1.05
+HOVER_WIDTH = int(CARD_WIDTH * HOVER_SCALE)
+HOVER_HEIGHT = int(CARD_HEIGHT * HOVER_SCALE)
+SHADOW_ALPHA = 100  # непрозрачность тени (0-255)
+SHADOW_OFFSET = 2
+
+shadows = {}  # (ширина, высота, альфа) -> общая картинка тени и ее видимые полосы
+
+def shadow_surface(width, height, alpha=SHADOW_ALPHA):
+    """Полупрозрачная тень карты, одна на размер и альфу"""
+    key = (width, height, alpha)
+    shadow = shadows.get(key)
+    if shadow is None:
+        surface = pygame.Surface((width, height), pygame.SRCALPHA)
+        pygame.draw.rect(surface, (0, 0, 0, alpha), surface.get_rect(), border_radius=3)
+        # Остальное закрывает сама карта, поэтому смешиваются только полосы справа и снизу
+        # (шириной в сдвиг тени плюс скругление угла)
+        strip = SHADOW_OFFSET + 3
+        shadow = shadows[key] = (surface, pygame.Rect(width - strip, 0, strip, height),
+                                 pygame.Rect(0, height - strip, width - strip, strip))
+    return shadow
+
 class Card:
+    # Цвета границ по типам (как в HTML)
+    border_colors = {
+        'aspect': RED,      # Красный для аспектов
+        'follower': GREEN,  # Зеленый для последователей
+        'location': PURPLE, # Фиолетовый для мест
+        'lore': ORANGE,     # Оранжевый для знаний
+        'resource': BLUE,   # Синий для ресурсов
+        'cult': GOLD        # Золотой для культа
+    }
+    
+    # Эмодзи
+    emojis = {
+        'aspect': '🔮',
+        'follower': '👤',
+        'location': '🏛️',
+        'lore': '📖',
+        'resource': '💰',
+        'cult': '☪️'
+    }
+    
+    # Без __dict__ у каждой карты: все, что зависит от типа, берется из таблиц класса
+    __slots__ = ('uid', 'title', 'description', 'type', 'value', 'x', 'y', 'dragging', 'hovered',
+                 'z_index', 'order', 'count', '_cache_key', '_cache')
+    
     def __init__(self, title, description, card_type, value=None, x=None, y=None):
         self.title = title
         self.description = description
@@ -35,88 +97,102 @@ class Card:
         self.dragging = False
         self.hovered = False
         self.z_index = 0
+        self.order = 0  # порядок отрисовки среди карт с одинаковым z_index
+        self.count = 1  # карт в стопке
         
-        # Цвета границ по типам (как в HTML)
-        self.border_colors = {
-            'aspect': RED,      # Красный для аспектов
-            'follower': GREEN,  # Зеленый для последователей
-            'location': PURPLE, # Фиолетовый для мест
-            'lore': ORANGE,     # Оранжевый для знаний
-            'resource': BLUE,   # Синий для ресурсов
-            'cult': GOLD        # Золотой для культа
-        }
-        self.border_color = self.border_colors.get(card_type, GOLD)
-        self.border_width = 3 if card_type == 'cult' else 2
-        
-        # Эмодзи
-        self.emojis = {
-            'aspect': '🔮',
-            'follower': '👤',
-            'location': '🏛️',
-            'lore': '📖',
-            'resource': '💰',
-            'cult': '☪️'
-        }
-        self.emoji = self.emojis.get(card_type, '❓')
+        # Кеш готовых картинок карты (обычной и при наведении), создается при первой отрисовке
+        self._cache_key = None
+        self._cache = None
     
-    def draw(self, screen, small_font):
+    @property
+    def border_color(self):
+        return self.border_colors.get(self.type, GOLD)
+    
+    @property
+    def border_width(self):
+        return 3 if self.type == 'cult' else 2
+    
+    @property
+    def emoji(self):
+        return self.emojis.get(self.type, '❓')
+    
+    def get_bounds(self):
         # Эффект при наведении
         if self.hovered:
-            scale = 1.05
-            width = int(CARD_WIDTH * scale)
-            height = int(CARD_HEIGHT * scale)
+            width, height = HOVER_WIDTH, HOVER_HEIGHT
             x = self.x - (width - CARD_WIDTH) // 2
             y = self.y - (height - CARD_HEIGHT) // 2
         else:
             width, height = CARD_WIDTH, CARD_HEIGHT
             x, y = self.x, self.y
+        return x, y, width, height
+    
+    def get_rect(self):
+        """Область экрана, которую занимает карта вместе с тенью"""
+        x, y, width, height = self.get_bounds()
+        return pygame.Rect(x, y, width + SHADOW_OFFSET, height + SHADOW_OFFSET)
+    
+    def draw(self, screen, small_font):
+        x, y, width, height = self.get_bounds()
         
-        # Тень
-        pygame.draw.rect(screen, (0, 0, 0, 100), (x+2, y+2, width, height), border_radius=3)
+        # Полосы общей полупрозрачной тени и готовая картинка карты вместо перерисовки текста
+        shadow, right, bottom = shadow_surface(width, height)
+        x2, y2 = x + SHADOW_OFFSET, y + SHADOW_OFFSET
+        screen.blits(((shadow, (x2 + right.x, y2), right), (shadow, (x2, y2 + bottom.y), bottom),
+                      (self.get_surface(small_font, self.hovered), (x, y))), doreturn=False)
+    
+    def get_surface(self, small_font, hovered=False):
+        """Возвращает закешированную картинку карты, перерисовывая ее только при изменении содержимого"""
+        key = (self.title, self.description, self.value, self.type, self.count, small_font)
+        if key != self._cache_key:
+            # Увеличенная картинка для наведения - сразу, масштабированием обычной,
+            # чтобы наведение не стоило раскладки текста
+            self._cache_key = key
+            surface = self.render(small_font, CARD_WIDTH, CARD_HEIGHT)
+            hover = pygame.transform.smoothscale(surface, (HOVER_WIDTH, HOVER_HEIGHT))
+            self._cache = (surface.convert_alpha(), hover.convert_alpha())
+        return self._cache[hovered]
+    
+    def render(self, small_font, width, height):
+        # Карта рисуется на отдельной поверхности с прозрачными углами, тень - отдельно
+        surface = pygame.Surface((width, height), pygame.SRCALPHA)
         
         # Карта
-        pygame.draw.rect(screen, DARK_GRAY, (x, y, width, height), border_radius=3)
-        pygame.draw.rect(screen, self.border_color, (x, y, width, height), self.border_width, border_radius=3)
+        pygame.draw.rect(surface, DARK_GRAY, (0, 0, width, height), border_radius=3)
+        pygame.draw.rect(surface, self.border_color, (0, 0, width, height), self.border_width, border_radius=3)
+        
+        text = text_renderer(small_font)
         
         # Заголовок с эмодзи
         title_text = f"{self.emoji} {self.title}"
         title_lines = self.wrap_text(title_text, small_font, width - 20)
-        for i, line in enumerate(title_lines[:2]):
-            title_surf = small_font.render(line, True, GOLD)
-            screen.blit(title_surf, (x + 5, y + 5 + i*15))
+        text.draw_lines(surface, title_lines[:2], (5, 5), GOLD, 15)
         
         # Разделитель под заголовком
-        pygame.draw.line(screen, GOLD, (x+5, y+35), (x+width-5, y+35), 1)
+        pygame.draw.line(surface, GOLD, (5, 35), (width-5, 35), 1)
         
         # Описание
         desc_lines = self.wrap_text(self.description, small_font, width - 10)
-        for i, line in enumerate(desc_lines[:3]):
-            desc_surf = small_font.render(line, True, GOLD)
-            screen.blit(desc_surf, (x + 5, y + 40 + i*15))
+        text.draw_lines(surface, desc_lines[:3], (5, 40), GOLD, 15)
         
         # Значение для ресурсов
         if self.value is not None:
-            value_surf = small_font.render(str(self.value), True, GOLD)
-            screen.blit(value_surf, (x + width - 25, y + height - 25))
+            text.draw(surface, str(self.value), (width - 25, height - 25), GOLD)
+        
+        # Число карт в стопке
+        if self.count > 1:
+            count_text = f"×{self.count}"
+            count_width, count_height = text.size(count_text)
+            badge = pygame.Rect(5, height - 27, count_width + 10, 20)
+            pygame.draw.rect(surface, BLACK, badge, border_radius=8)
+            pygame.draw.rect(surface, self.border_color, badge, 1, border_radius=8)
+            text.draw(surface, count_text, (badge.centerx - count_width // 2, badge.centery - count_height // 2), GOLD)
+        
+        return surface
     
     def wrap_text(self, text, font, max_width):
-        words = text.split()
-        lines = []
-        current_line = []
-        
-        for word in words:
-            test_line = ' '.join(current_line + [word])
-            if font.size(test_line)[0] <= max_width:
-                current_line.append(word)
-            else:
-                if current_line:
-                    lines.append(' '.join(current_line))
-                current_line = [word]
-        
-        if current_line:
-            lines.append(' '.join(current_line))
-        
-        return lines
+        # Ширина считается по закешированной ширине глифов, а не font.size на каждый префикс
+        return text_renderer(font).wrap(text, max_width)
     
     def is_clicked(self, pos):
         return (self.x <= pos[0] <= self.x + CARD_WIDTH and 
@@ -151,10 +227,11 @@ class Button:
         pygame.draw.rect(screen, color, self.rect, border_radius=3)
         pygame.draw.rect(screen, text_color, self.rect, 2, border_radius=3)
         
-        text_surf = font.render(self.text, True, text_color)
-        text_x = self.rect.x + (self.rect.width - text_surf.get_width()) // 2
-        text_y = self.rect.y + (self.rect.height - text_surf.get_height()) // 2
-        screen.blit(text_surf, (text_x, text_y))
+        text = text_renderer(font)
+        text_width, text_height = text.size(self.text)
+        text_x = self.rect.x + (self.rect.width - text_width) // 2
+        text_y = self.rect.y + (self.rect.height - text_height) // 2
+        text.draw(screen, self.text, (text_x, text_y), text_color)
     
     def is_clicked(self, pos):
         return self.visible and not self.disabled and self.rect.collidepoint(pos)
@@ -162,8 +239,194 @@ class Button:
     def update_hover(self, pos):
         self.hovered = self.rect.collidepoint(pos)
 
-class CultGame:
-    def __init__(self):
+class CardGrid:
+    """Равномерная сетка над картами: поиск карт под курсором без перебора всего стола"""
+    def __init__(self, cell_size=CARD_WIDTH // 2):
+        self.cell_size = cell_size
+        # В каждой ячейке карты упорядочены снизу вверх (dict как упорядоченное множество)
+        self.cells = {}
+        self.card_cells = {}
+    
+    @staticmethod
+    def sort_key(card):
+        return (card.z_index, card.order)
+    
+    def get_cells(self, card):
+        size = self.cell_size
+        return [(cx, cy)
+                for cx in range(card.x // size, (card.x + CARD_WIDTH) // size + 1)
+                for cy in range(card.y // size, (card.y + CARD_HEIGHT) // size + 1)]
+    
+    def insert(self, card):
+        cells = self.get_cells(card)
+        self.card_cells[card] = cells
+        key = self.sort_key(card)
+        for cell in cells:
+            bucket = self.cells.get(cell)
+            if bucket is None:
+                self.cells[cell] = {card: None}
+            elif key >= self.sort_key(next(reversed(bucket))):
+                # Обычный случай: новая или поднятая карта ложится сверху
+                bucket[card] = None
+            else:
+                self.cells[cell] = dict.fromkeys(sorted([*bucket, card], key=self.sort_key))
+    
+    def insert_many(self, cards):
+        """Добавляет карты, уже упорядоченные снизу вверх (быстрый путь для загрузки)"""
+        if self.cells:
+            for card in cards:
+                self.insert(card)
+            return
+        buckets = self.cells
+        for card in cards:
+            cells = self.card_cells[card] = self.get_cells(card)
+            for cell in cells:
+                bucket = buckets.get(cell)
+                if bucket is None:
+                    buckets[cell] = {card: None}
+                else:
+                    bucket[card] = None
+    
+    def remove(self, card):
+        for cell in self.card_cells.pop(card):
+            bucket = self.cells[cell]
+            del bucket[card]
+            if not bucket:
+                del self.cells[cell]
+    
+    def move(self, card):
+        # Пока карта в тех же ячейках, сетку трогать не нужно
+        if self.get_cells(card) != self.card_cells[card]:
+            self.remove(card)
+            self.insert(card)
+    
+    def lift(self, card):
+        # Карта поднята наверх - переставляем ее в конец своих ячеек
+        for cell in self.card_cells.get(card, ()):
+            bucket = self.cells[cell]
+            del bucket[card]
+            bucket[card] = None
+    
+    def cards_at(self, pos):
+        cell = (pos[0] // self.cell_size, pos[1] // self.cell_size)
+        return [card for card in self.cells.get(cell, ()) if card.is_clicked(pos)]
+    
+    def top_card_at(self, pos):
+        """Верхняя карта под точкой (та, что нарисована последней)"""
+        cell = (pos[0] // self.cell_size, pos[1] // self.cell_size)
+        for card in reversed(self.cells.get(cell, {})):
+            if card.is_clicked(pos):
+                return card
+        return None
+
+class DirtyRenderer:
+    """Перерисовывает только изменившиеся области игрового экрана"""
+    def __init__(self, game):
+        self.game = game
+        self.regions = {}
+        self.state = None
+        self.pending = []
+    
+    def invalidate(self, rect=None):
+        # Без прямоугольника - перерисовать весь экран
+        if rect is None:
+            self.state = None
+        else:
+            self.pending.append(pygame.Rect(rect))
+    
+    def collect(self):
+        # Подписи областей: если подпись изменилась, область нужно перерисовать
+        game = self.game
+        regions = {}
+        
+        for card in game.cards:
+            rect = card.get_rect()
+            regions[('card', id(card))] = ((card.title, card.description, card.value, card.type, card.count, card.hovered, card.z_index, card.order, tuple(rect)), rect)
+        
+        resources_rect = pygame.Rect(20, 55, SCREEN_WIDTH - PANEL_WIDTH - 40, game.font.get_linesize())
+        regions['resources'] = ((game.health, game.reason, game.funds), resources_rect)
+        
+        # Строки журнала выходят за рамку (последняя - за низ рамки, длинные - вправо)
+        lines = game.log_lines()
+        regions['log'] = ((len(game.history), game.log_scroll),
+                          LOG_RECT.unionall([image.get_rect(topleft=pos) for image, pos in lines]))
+        
+        for i, btn in enumerate(game.buttons):
+            regions[('button', i)] = ((btn.text, btn.visible, btn.hovered, btn.disabled), btn.rect)
+        
+        return regions
+    
+    def render(self):
+        """Рисует кадр и возвращает список обновленных прямоугольников"""
+        game = self.game
+        screen = game.screen
+        state = (game.game_state, game.current_ending)
+        
+        if game.game_state != "game":
+            # Меню и концовка статичны - рисуем их один раз
+            if state == self.state:
+                return []
+            self.state = state
+            self.pending = []
+            if game.game_state == "menu":
+                game.draw_menu()
+            else:
+                game.draw_ending()
+            if game.profiler.enabled:
+                game.profiler.mark("screen")
+            return [screen.get_rect()]
+        
+        game.update_card_hover(pygame.mouse.get_pos())
+        
+        regions = self.collect()
+        dirty = self.pending
+        self.pending = []
+        
+        if state != self.state:
+            self.state = state
+            dirty = [screen.get_rect()]
+        else:
+            for key, (signature, rect) in regions.items():
+                old = self.regions.get(key)
+                if old is None:
+                    dirty.append(rect)
+                elif old[0] != signature:
+                    dirty.append(old[1])
+                    dirty.append(rect)
+            for key in self.regions.keys() - regions.keys():
+                dirty.append(self.regions[key][1])
+        self.regions = regions
+        
+        # Объединяем пересекающиеся области (старое и новое место карты)
+        merged = []
+        for rect in dirty:
+            rect = rect.clip(screen.get_rect())
+            if not rect.width or not rect.height:
+                continue
+            i = rect.collidelist(merged)
+            while i != -1:
+                rect.union_ip(merged.pop(i))
+                i = rect.collidelist(merged)
+            merged.append(rect)
+        
+        if game.profiler.enabled:
+            game.profiler.mark("dirty")
+        for rect in merged:
+            screen.set_clip(rect)
+            game.draw_game(rect)
+        screen.set_clip(None)
+        return merged
+
+def coalesce_motion(events):
+    """Из движений мыши подряд оставляет последнее: карта все равно встанет в его точку"""
+    return [event for event, following in zip(events, events[1:] + [None])
+            if not (event.type == pygame.MOUSEMOTION and following is not None and following.type == pygame.MOUSEMOTION)]
+
+class CultGame(CultRules):
+    def __init__(self, dirty_rects=DIRTY_RECTS, save_path=SAVE_PATH, load=True, seed=None, log_dir=LOG_DIR):
+        # Окно, шрифты и профайлер создаются один раз, новая партия - reset()
+        if not pygame.get_init():
+            pygame.init()
         self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
         pygame.display.set_caption("Тайный Культ")
         self.clock = pygame.time.Clock()
@@ -172,333 +435,289 @@ class CultGame:
         self.title_font = pygame.font.Font(None, 36)
         self.font = pygame.font.Font(None, 24)
         self.small_font = pygame.font.Font(None, 18)
+        for font in (self.font, self.small_font):
+            text_renderer(font, TEXT_MODE)
+        
+        # Статичные фоны экранов (background), переживают рестарт партии
+        self.backgrounds = {}
+        
+        # Профайлер кадра (F3)
+        self.profiler = FrameProfiler()
+        
+        # Метрики действий, карт, концовок и кадров (выгрузка в файл - --metrics)
+        self.metrics = GameMetrics()
+        
+        # История журнала переживает рестарт партии; колесо мыши над журналом листает ее назад
+        self.history = EventLog(log_dir)
+        self.log_scroll = 0  # на сколько записей журнал прокручен назад
         
-        # Игровое состояние
-        self.health = 10
-        self.reason = 10
-        self.funds = 5
-        self.cards = []
-        self.log_entries = ["Вы начинаете свой путь в тайных знаниях..."]
-        self.cult_created = False
-        self.has_ancient_knowledge = False
-        self.has_first_follower = False
-        
-        # Концовки
-        self.endings = {
-            "ASCENSION": {
-                "title": "ВОЗНЕСЕНИЕ",
-                "description": "Вы собрали все компоненты и провели Великий Ритуал. Древние силы признали вас достойным и вознесли за пределы материального мира."
-            },
-            "MADNESS": {
-                "title": "БЕЗУМИЕ",
-                "description": "Вы заглянули слишком глубоко в бездну. Ваш разум не выдержал столкновения с невыразимыми истинами."
-            },
-            "CULT_LEADER": {
-                "title": "ЛИДЕР КУЛЬТА",
-                "description": "Вы основали процветающий культ. Члены поклоняются вам как пророку. Ваше влияние растет с каждым днем."
-            },
-            "FORGOTTEN": {
-                "title": "ЗАБЫТЫЙ",
-                "description": "Ваши поиски привели в забытые уголки мира, но вы так и не нашли того, что искали. Постепенно о вас забыли."
-            }
-        }
-        
-        # Создаем начальные карты
-        self.create_card("Здоровье", "Ваша жизненная сила", 'resource', self.health, 20, 100)
-        self.create_card("Рассудок", "Ваша ментальная стабильность", 'resource', self.reason, 160, 100)
-        self.create_card("Деньги", "Средства к существованию", 'resource', self.funds, 300, 100)
-        self.create_card("Старая книга", "Тайные знания ждут изучения", 'lore', None, 20, 280)
-        self.create_card("Таинственный незнакомец", "Проявил интерес к оккультному", 'follower', None, 160, 280)
+        # Перерисовка только изменившихся областей (по желанию)
+        self.dirty_rects = dirty_rects
+        self.renderer = DirtyRenderer(self) if dirty_rects else None
+        
+        self.save_path = save_path
+        self.reset(seed, load)
+    
+    def reset(self, seed=None, load=False):
+        """Новая партия (или загрузка сохранения) в том же окне и с теми же шрифтами"""
+        # Сетка для поиска карт под курсором и карты снизу вверх (dict как упорядоченное множество)
+        self.card_grid = CardGrid()
+        self.z_order = {}
+        self.hovered_cards = []
+        
+        # Игровое состояние и начальные карты. Вся случайность - из генераторов по seed:
+        # rng для правил, layout_rng для мест новых карт
+        self.seed = seed
+        self.layout_rng = random.Random(None if seed is None else f"layout:{seed}")
+        CultRules.__init__(self, random.Random(seed))
         
         # Кнопки действий
         self.buttons = [
-            Button(SCREEN_WIDTH - PANEL_WIDTH + 10, 80, PANEL_WIDTH - 20, 30, "Работать"),
-            Button(SCREEN_WIDTH - PANEL_WIDTH + 10, 120, PANEL_WIDTH - 20, 30, "Изучать"),
-            Button(SCREEN_WIDTH - PANEL_WIDTH + 10, 160, PANEL_WIDTH - 20, 30, "Сны"),
-            Button(SCREEN_WIDTH - PANEL_WIDTH + 10, 200, PANEL_WIDTH - 20, 30, "Беседовать"),
-            Button(SCREEN_WIDTH - PANEL_WIDTH + 10, 240, PANEL_WIDTH - 20, 30, "Исследовать"),
-            Button(SCREEN_WIDTH - PANEL_WIDTH + 10, 280, PANEL_WIDTH - 20, 30, "Отдых"),
-            Button(SCREEN_WIDTH - PANEL_WIDTH + 10, 320, PANEL_WIDTH - 20, 30, "Ритуал", False),
-            Button(SCREEN_WIDTH - PANEL_WIDTH + 10, 360, PANEL_WIDTH - 20, 30, "Создать культ", False)
+            Button(SCREEN_WIDTH - PANEL_WIDTH + 10, 80 + i*40, PANEL_WIDTH - 20, 30, action, i < 6)
+            for i, action in enumerate(ACTIONS)
         ]
         
-        self.game_state = "menu"  # menu, game, ending
-        self.current_ending = None
+        if self.renderer:
+            self.renderer.invalidate()
+        
+        # Сохранение: продолжаем прошлую игру или начинаем новое сохранение
+        # Журнал сохранения подключается до загрузки: записи журнала событий, которые
+        # проигрываются при загрузке, уже есть в истории
+        loaded = False
+        if self.save_path:
+            journal = self.journal = GameJournal(self.save_path)
+            try:
+                loaded = load and journal.load(self)
+            except SaveError:
+                journal.close()
+                self.reset(seed)
+                self.add_log("Сохранение повреждено, начата новая игра.")
+                return
+            if not loaded:
+                journal.compact(self)
+        
+        if not loaded or not len(self.history):
+            self.history.extend(self.log_entries)
+        self.log_scroll = 0
+        self.metrics.count_cards(self.type_counts)
+        
+        if self.game_state != "ending":
+            self.game_state = "menu"  # menu, game, ending
     
-    def create_card(self, title, desc, card_type, value=None, x=None, y=None):
-        card = Card(title, desc, card_type, value, x, y)
-        self.cards.append(card)
-        return card
+    def new_card(self, title, desc, card_type, value=None, x=None, y=None):
+        if x is None:
+            x = self.layout_rng.randint(20, SCREEN_WIDTH - PANEL_WIDTH - CARD_WIDTH - 20)
+        if y is None:
+            y = self.layout_rng.randint(80, SCREEN_HEIGHT - CARD_HEIGHT - 120)
+        return Card(title, desc, card_type, value, x, y)
     
-    def update_resources(self):
-        for card in self.cards:
-            if card.title == "Здоровье":
-                card.value = self.health
-            elif card.title == "Рассудок":
-                card.value = self.reason
-            elif card.title == "Деньги":
-                card.value = self.funds
+    def perform_action(self, action):
+        # Исход для метрик: концовка, новая карта, действие выполнено или не удалось
+        metrics = self.metrics
+        created = metrics.created
+        start = time.perf_counter()
+        done = CultRules.perform_action(self, action)
+        seconds = time.perf_counter() - start
+        if self.game_state == "ending":
+            outcome = "ending"
+        elif metrics.created != created:
+            outcome = "card"
+        else:
+            outcome = "ok" if done else "refused"
+        metrics.action(action, outcome, seconds)
+        return done
+    
+    def create_card(self, title, desc, card_type, value=None, x=None, y=None, stack=True):
+        card = CultRules.create_card(self, title, desc, card_type, value, x, y, stack)
+        # Карта, снятая со стопки (stack=False), не новая
+        if stack:
+            self.metrics.card_created(card_type, self.type_counts[card_type])
+        return card
     
     def add_log(self, text):
-        self.log_entries.append(text)
-        if len(self.log_entries) > 5:
-            self.log_entries.pop(0)
+        CultRules.add_log(self, text)
+        if self.journal is None or not self.journal.paused:
+            self.history.append(text)
+            self.log_scroll = 0
+    
+    def add_card(self, card):
+        CultRules.add_card(self, card)
+        self.card_grid.insert(card)
+        self.order_card(card)
+    
+    def add_cards(self, cards):
+        CultRules.add_cards(self, cards)
+        self.card_grid.insert_many(cards)
+        for card in cards:
+            self.order_card(card)
+    
+    def clear_cards(self):
+        CultRules.clear_cards(self)
+        self.card_grid = CardGrid()
+        self.z_order = {}
+        self.hovered_cards = []
+    
+    def place_card(self, card, x, y, z_index, order):
+        self.card_grid.remove(card)
+        CultRules.place_card(self, card, x, y, z_index, order)
+        self.card_grid.insert(card)
+        self.order_card(card)
+    
+    def remove_card(self, card):
+        CultRules.remove_card(self, card)
+        self.card_grid.remove(card)
+        del self.z_order[card]
+        if card in self.hovered_cards:
+            self.hovered_cards.remove(card)
+    
+    def raise_card(self, card):
+        CultRules.raise_card(self, card)
+        self.card_grid.lift(card)
+        # Ключ поднятой карты больше всех: она просто переезжает в конец
+        del self.z_order[card]
+        self.z_order[card] = None
+    
+    def order_card(self, card):
+        # Ставит карту в z_order. Обычно ее ключ самый большой и она ложится в конец;
+        # иначе (ход из журнала старого сохранения) порядок пересобирается сортировкой
+        self.z_order.pop(card, None)
+        if self.z_order and CardGrid.sort_key(card) < CardGrid.sort_key(next(reversed(self.z_order))):
+            self.z_order[card] = None
+            self.z_order = dict.fromkeys(sorted(self.z_order, key=CardGrid.sort_key))
+        else:
+            self.z_order[card] = None
+    
+    def stack_under(self, card, pos):
+        """Верхняя карта под pos (кроме самой card), если она из той же стопки"""
+        for other in reversed(self.card_grid.cards_at(pos)):
+            if other is not card:
+                same = (other.type, other.title, other.description, other.value) == (card.type, card.title, card.description, card.value)
+                return other if same and self.stack_cards else None
+        return None
+    
+    def update_card_hover(self, pos):
+        # Подсвечиваем только верхнюю карту под курсором, флаг меняем у двух карт максимум
+        card = self.card_grid.top_card_at(pos)
+        hovered = [card] if card else []
+        for card in self.hovered_cards:
+            card.hovered = False
+        for card in hovered:
+            card.hovered = True
+        self.hovered_cards = hovered
     
     def check_cult_creation(self):
-        has_knowledge = any(c.type == 'lore' and "Древнее знание" in c.title for c in self.cards)
-        has_follower = any(c.type == 'follower' for c in self.cards)
-        
-        self.has_ancient_knowledge = has_knowledge
-        self.has_first_follower = has_follower
+        can_create = CultRules.check_cult_creation(self)
         
         # Обновляем кнопки
-        self.buttons[7].visible = has_knowledge and has_follower and not self.cult_created
+        self.buttons[7].visible = can_create
         self.buttons[6].visible = self.cult_created
         
-        return has_knowledge and has_follower and not self.cult_created
-    
-    def perform_ritual_check(self):
-        """Проверяет условия для концовок через ритуалы"""
-        lore_cards = [c for c in self.cards if c.type == 'lore']
-        follower_cards = [c for c in self.cards if c.type == 'follower']
-        aspect_cards = [c for c in self.cards if c.type == 'aspect']
-        location_cards = [c for c in self.cards if c.type == 'location']
-        has_cult = any(c.type == 'cult' for c in self.cards)
-        
-        if not has_cult:
-            return None
-        
-        # Ритуал Вознесения
-        if len(lore_cards) >= 3 and len(follower_cards) >= 2:
-            return "ASCENSION"
-        
-        # Ритуал Безумия
-        if len(aspect_cards) >= 5:
-            return "MADNESS"
-        
-        # Ритуал Лидера Культа
-        if len(follower_cards) >= 5:
-            return "CULT_LEADER"
-        
-        # Ритуал Забвения
-        if len(location_cards) >= 3:
-            return "FORGOTTEN"
-        
-        return None
+        return can_create
     
-    def perform_action(self, action):
-        msg = ""
-        
-        if action == "Работать":
-            if self.health > 2:
-                self.funds += 2
-                self.health -= 1
-                msg = "Вы работаете и зарабатываете деньги. Здоровье ухудшается."
-                
-                if random.random() > 0.8:
-                    # Исправленная подпись: не "последователь", пока культ не создан
-                    if self.cult_created:
-                        self.create_card("Последователь", "Член вашего культа", 'follower')
-                        msg += " Вы находите нового последователя."
-                    else:
-                        self.create_card("Заинтересованный", "Проявил интерес к вашим идеям", 'follower')
-                        msg += " Кто-то проявил интерес."
-            else:
-                msg = "Вы слишком истощены для работы."
-        
-        elif action == "Изучать":
-            if self.reason > 1:
-                lore_cards = [c for c in self.cards if c.type == 'lore']
-                if lore_cards:
-                    self.reason -= 1
-                    msg = "Вы изучаете древние тексты. Рассудок страдает."
-                    
-                    if random.random() > 0.7:
-                        self.create_card("Древнее знание", "Запретные знания предков", 'lore')
-                        self.has_ancient_knowledge = True
-                        msg += " Вы находите древнее знание."
-                else:
-                    msg = "У вас нет материалов для изучения."
-            else:
-                msg = "Ваш рассудок слишком хрупок."
-        
-        elif action == "Сны":
-            if self.reason > 0:
-                self.reason -= 1
-                msg = "Вы погружаетесь в странные сны. Рассудок страдает."
-                
-                if random.random() > 0.7:
-                    self.create_card("Видение", "Образ из снов", 'aspect')
-                    msg += " Вы получаете видение."
-            else:
-                msg = "Вы слишком близки к безумию, чтобы спать."
-        
-        elif action == "Беседовать":
-            msg = "Вы ищете единомышленников."
-            
-            if random.random() > 0.5:
-                # Исправленная подпись в зависимости от наличия культа
-                if self.cult_created:
-                    self.create_card("Новичок", "Новый член культа", 'follower')
-                    msg += " Вы находите нового члена культа."
-                else:
-                    self.create_card("Сочувствующий", "Интересуется оккультизмом", 'follower')
-                    self.has_first_follower = True
-                    msg += " Вы находите сочувствующего."
-            else:
-                msg += " Никто не проявил интереса."
-        
-        elif action == "Исследовать":
-            if self.funds > 0:
-                self.funds -= 1
-                msg = "Вы исследуете окрестности."
-                
-                if random.random() > 0.6:
-                    self.create_card("Заброшенный храм", "Место, полное тайн", 'location')
-                    msg += " Вы находите заброшенный храм."
-            else:
-                msg = "У вас недостаточно денег."
-        
-        elif action == "Отдых":
-            if self.funds > 0:
-                self.funds -= 1
-                self.health = min(10, self.health + 2)
-                self.reason = min(10, self.reason + 1)
-                msg = "Вы отдыхаете и восстанавливаете силы."
-            else:
-                msg = "У вас недостаточно денег для отдыха."
-        
-        elif action == "Ритуал":
-            if not self.cult_created:
-                msg = "Сначала создайте культ!"
-            else:
-                ritual_result = self.perform_ritual_check()
-                if ritual_result:
-                    self.game_state = "ending"
-                    self.current_ending = ritual_result
-                    return
-                else:
-                    if self.health > 1 and self.reason > 1:
-                        self.health -= 1
-                        self.reason -= 1
-                        msg = "Вы проводите таинственный ритуал."
-                        
-                        if random.random() > 0.8:
-                            self.create_card("Древний артефакт", "Предмет невероятной силы", 'lore')
-                            msg += " Ритуал увенчался успехом!"
-                        else:
-                            msg += " Ритуал не принес результатов."
-                    else:
-                        msg = "Недостаточно здоровья или рассудка."
-        
-        elif action == "Создать культ":
-            if self.check_cult_creation():
-                self.create_card("Тайный культ", "Ваша организация", 'cult')
-                self.cult_created = True
-                msg = "Вы создали Тайный культ! Теперь можете проводить ритуалы."
-                
-                # Переименовываем существующих "сочувствующих" в "последователей"
-                for card in self.cards:
-                    if card.type == 'follower':
-                        if "Сочувствующий" in card.title:
-                            card.title = "Последователь"
-                            card.description = "Член вашего культа"
-                        elif "Заинтересованный" in card.title:
-                            card.title = "Последователь"
-                            card.description = "Член вашего культа"
-            else:
-                msg = "Нужно Древнее знание и хотя бы один сочувствующий."
-        
-        self.add_log(msg)
-        self.update_resources()
-        self.check_cult_creation()
-        
-        # Автоматические концовки (без ритуала)
-        if self.reason <= 0:
-            self.game_state = "ending"
-            self.current_ending = "MADNESS"
-            return
-        
-        if self.health <= 0:
-            self.game_state = "ending"
-            self.current_ending = "FORGOTTEN"
-            return
-        
-        # Много видений = безумие
-        aspect_cards = [c for c in self.cards if c.type == 'aspect']
-        if len(aspect_cards) >= 7:
-            self.game_state = "ending"
-            self.current_ending = "MADNESS"
-            return
+    def background(self, key, build):
+        """Статичная часть экрана: build рисует ее на поверхность один раз для каждого key"""
+        surface = self.backgrounds.get(key)
+        if surface is None:
+            surface = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT)).convert()
+            build(surface)
+            self.backgrounds[key] = surface
+        return surface
     
-    def draw_menu(self):
-        self.screen.fill(BLACK)
+    def build_menu(self, surface):
+        surface.fill(BLACK)
         
         title = self.title_font.render("ТАЙНЫЙ КУЛЬТ", True, GOLD)
-        self.screen.blit(title, (SCREEN_WIDTH//2 - title.get_width()//2, 100))
+        surface.blit(title, (SCREEN_WIDTH//2 - title.get_width()//2, 100))
         
         subtitle = self.font.render("Нажмите SPACE чтобы начать", True, GOLD)
-        self.screen.blit(subtitle, (SCREEN_WIDTH//2 - subtitle.get_width()//2, 300))
+        surface.blit(subtitle, (SCREEN_WIDTH//2 - subtitle.get_width()//2, 300))
         
         controls = self.small_font.render("Тащите карты. Используйте кнопки справа", True, GOLD)
-        self.screen.blit(controls, (SCREEN_WIDTH//2 - controls.get_width()//2, 400))
+        surface.blit(controls, (SCREEN_WIDTH//2 - controls.get_width()//2, 400))
         
         tip = self.small_font.render("Соберите Древнее знание и последователя для создания культа", True, GOLD)
-        self.screen.blit(tip, (SCREEN_WIDTH//2 - tip.get_width()//2, 450))
+        surface.blit(tip, (SCREEN_WIDTH//2 - tip.get_width()//2, 450))
+    
+    def draw_menu(self):
+        self.screen.blit(self.background("menu", self.build_menu), (0, 0))
     
-    def draw_game(self):
+    def build_game(self, surface):
         # Фон
-        self.screen.fill(BLACK)
+        surface.fill(BLACK)
         
         # Заголовок
         title = self.title_font.render("ТАЙНЫЙ КУЛЬТ", True, GOLD)
-        self.screen.blit(title, (SCREEN_WIDTH//2 - title.get_width()//2, 10))
+        surface.blit(title, (SCREEN_WIDTH//2 - title.get_width()//2, 10))
         
         # Разделительная линия
-        pygame.draw.line(self.screen, GOLD, (20, 45), (SCREEN_WIDTH - PANEL_WIDTH - 20, 45), 2)
-        
-        # Ресурсы
-        resources = self.font.render(f"Здоровье: {self.health} | Рассудок: {self.reason} | Деньги: {self.funds}", True, GOLD)
-        self.screen.blit(resources, (20, 55))
+        pygame.draw.line(surface, GOLD, (20, 45), (SCREEN_WIDTH - PANEL_WIDTH - 20, 45), 2)
         
         # Панель действий
         panel = pygame.Rect(SCREEN_WIDTH - PANEL_WIDTH, 0, PANEL_WIDTH, SCREEN_HEIGHT)
-        pygame.draw.rect(self.screen, DARK_GRAY, panel)
-        pygame.draw.rect(self.screen, GOLD, panel, 2)
+        pygame.draw.rect(surface, DARK_GRAY, panel)
+        pygame.draw.rect(surface, GOLD, panel, 2)
         
         panel_title = self.font.render("Действия", True, GOLD)
-        self.screen.blit(panel_title, (SCREEN_WIDTH - PANEL_WIDTH + 20, 40))
+        surface.blit(panel_title, (SCREEN_WIDTH - PANEL_WIDTH + 20, 40))
+        
+        # Рамка журнала
+        pygame.draw.rect(surface, DARK_GRAY, LOG_RECT)
+        pygame.draw.rect(surface, GOLD, LOG_RECT, 2)
+        
+        log_title = self.font.render("Журнал событий:", True, GOLD)
+        surface.blit(log_title, (20, SCREEN_HEIGHT - 90))
+    
+    def log_lines(self):
+        """Видимые строки журнала: (картинка, позиция)"""
+        # Каждая запись рисуется один раз, картинка хранится в истории
+        entries = self.history.entries(len(self.history) - LOG_LINES - self.log_scroll, LOG_LINES)
+        for entry in entries:
+            if entry[1] is None:
+                entry[1] = self.small_font.render(entry[0], True, GOLD)
+        return [(entry[1], (20, SCREEN_HEIGHT - 65 + i * 20)) for i, entry in enumerate(entries)]
+    
+    def draw_game(self, clip=None):
+        # Фон, заголовок, панель и рамка журнала
+        self.screen.blit(self.background("game", self.build_game), (0, 0))
+        
+        # Ресурсы
+        resources = f"Здоровье: {self.health} | Рассудок: {self.reason} | Деньги: {self.funds}"
+        text_renderer(self.font).draw(self.screen, resources, (20, 55), GOLD)
         
         # Кнопки
         for btn in self.buttons:
             btn.draw(self.screen, self.small_font)
         
-        # Карты (сортировка по z_index)
-        sorted_cards = sorted(self.cards, key=lambda c: c.z_index)
-        mouse_pos = pygame.mouse.get_pos()
-        for card in sorted_cards:
-            card.update_hover(mouse_pos)
-            card.draw(self.screen, self.small_font)
-        
-        # Журнал
-        log_rect = pygame.Rect(10, SCREEN_HEIGHT - 100, SCREEN_WIDTH - PANEL_WIDTH - 20, 90)
-        pygame.draw.rect(self.screen, DARK_GRAY, log_rect)
-        pygame.draw.rect(self.screen, GOLD, log_rect, 2)
+        profiler = self.profiler if self.profiler.enabled else None
+        if profiler:
+            profiler.mark("ui")
         
-        log_title = self.font.render("Журнал событий:", True, GOLD)
-        self.screen.blit(log_title, (20, SCREEN_HEIGHT - 90))
+        # Карты снизу вверх: z_order поддерживается при добавлении и подъеме карт
+        self.update_card_hover(pygame.mouse.get_pos())
+        if profiler:
+            profiler.mark("hover")
+        for card in self.z_order:
+            if clip is None or clip.colliderect(card.get_rect()):
+                card.draw(self.screen, self.small_font)
+        if profiler:
+            profiler.mark("cards")
         
-        for i, entry in enumerate(self.log_entries[-4:]):
-            entry_surf = self.small_font.render(entry, True, GOLD)
-            self.screen.blit(entry_surf, (20, SCREEN_HEIGHT - 65 + i*20))
+        # Журнал
+        self.screen.blits(self.log_lines(), doreturn=False)
+        if self.log_scroll:
+            position = f"-{self.log_scroll}"
+            text = text_renderer(self.small_font)
+            text.draw(self.screen, position, (SCREEN_WIDTH - PANEL_WIDTH - 20 - text.width(position), SCREEN_HEIGHT - 90), GOLD)
+        if profiler:
+            profiler.mark("log")
     
-    def draw_ending(self):
-        self.screen.fill(BLACK)
+    def build_ending(self, surface):
+        surface.fill(BLACK)
         
         if self.current_ending in self.endings:
             ending = self.endings[self.current_ending]
             title = self.title_font.render(ending["title"], True, GOLD)
-            self.screen.blit(title, (SCREEN_WIDTH//2 - title.get_width()//2, 100))
+            surface.blit(title, (SCREEN_WIDTH//2 - title.get_width()//2, 100))
             
             # Разбиваем описание на строки
             words = ending["description"].split()
@@ -518,76 +737,102 @@ class CultGame:
             
             for i, line in enumerate(lines):
                 line_surf = self.font.render(line, True, GOLD)
-                self.screen.blit(line_surf, (50, 180 + i*30))
+                surface.blit(line_surf, (50, 180 + i*30))
         else:
             title = self.title_font.render("КОНЕЦ ИГРЫ", True, GOLD)
-            self.screen.blit(title, (SCREEN_WIDTH//2 - title.get_width()//2, 200))
+            surface.blit(title, (SCREEN_WIDTH//2 - title.get_width()//2, 200))
         
         restart = self.font.render("Нажмите R для новой игры", True, GOLD)
-        self.screen.blit(restart, (SCREEN_WIDTH//2 - restart.get_width()//2, 450))
+        surface.blit(restart, (SCREEN_WIDTH//2 - restart.get_width()//2, 450))
         
         menu = self.font.render("Нажмите ESC для выхода в меню", True, GOLD)
-        self.screen.blit(menu, (SCREEN_WIDTH//2 - menu.get_width()//2, 500))
+        surface.blit(menu, (SCREEN_WIDTH//2 - menu.get_width()//2, 500))
     
-    def run(self):
-        running = True
-        dragged_card = None
-        drag_offset = (0, 0)
-        
-        while running:
-            mouse_pos = pygame.mouse.get_pos()
-            
-            # Обновление hover для кнопок
+    def draw_ending(self):
+        # Экран концовки целиком статичен, свой для каждой концовки
+        self.screen.blit(self.background(("ending", self.current_ending), self.build_ending), (0, 0))
+    
+    def handle_event(self, event):
+        if event.type == pygame.QUIT:
+            self.running = False
+        
+        elif event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_SPACE and self.game_state == "menu":
+                self.game_state = "game"
+            elif event.key == pygame.K_r and self.game_state == "ending":
+                if self.journal:
+                    self.journal.close()
+                # Seed новой партии берем из текущей, чтобы запись повторялась
+                self.reset(seed=self.rng.randrange(2 ** 32))
+            elif event.key == pygame.K_ESCAPE:
+                if self.game_state == "ending":
+                    self.game_state = "menu"
+            elif event.key == pygame.K_F3:
+                self.profiler.toggle_overlay()
+                if self.renderer:
+                    self.renderer.invalidate()
+        
+        elif event.type == pygame.MOUSEWHEEL and self.game_state == "game":
+            # Прокрутка журнала: вверх - к старым записям
+            if LOG_RECT.collidepoint(pygame.mouse.get_pos()):
+                oldest = len(self.history) - self.history.start() - LOG_LINES
+                self.log_scroll = max(0, min(self.log_scroll + event.y, oldest))
+        
+        elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+            # Окно нужно нарисовать заново целиком
+            if self.renderer:
+                self.renderer.invalidate()
+        
+        elif event.type == pygame.MOUSEBUTTONDOWN and self.game_state == "game":
+            # Проверка кнопок
             for btn in self.buttons:
-                btn.update_hover(mouse_pos)
+                if btn.is_clicked(event.pos):
+                    self.perform_action(btn.text)
+                    break
             
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    running = False
-                
-                elif event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_SPACE and self.game_state == "menu":
-                        self.game_state = "game"
-                    elif event.key == pygame.K_r and self.game_state == "ending":
-                        self.__init__()  # Полный рестарт
-                    elif event.key == pygame.K_ESCAPE:
-                        if self.game_state == "ending":
-                            self.game_state = "menu"
-                
-                elif event.type == pygame.MOUSEBUTTONDOWN and self.game_state == "game":
-                    # Проверка кнопок
-                    for btn in self.buttons:
-                        if btn.is_clicked(mouse_pos):
-                            self.perform_action(btn.text)
-                            break
-                    
-                    # Проверка карт
-                    for card in self.cards:
-                        if card.is_clicked(mouse_pos):
-                            dragged_card = card
-                            drag_offset = (mouse_pos[0] - card.x, mouse_pos[1] - card.y)
-                            card.z_index = 100  # Поднимаем наверх
-                            # Перемещаем в конец списка для отрисовки поверх
-                            self.cards.remove(card)
-                            self.cards.append(card)
-                            break
+            # Проверка карт: берем верхнюю карту под курсором, из стопки - одну карту
+            card = self.card_grid.top_card_at(event.pos)
+            if card and card.count > 1:
+                card = self.split_card(card)
+            if card:
+                self.dragged_card = card
+                self.drag_offset = (event.pos[0] - card.x, event.pos[1] - card.y)
+                self.raise_card(card)  # Поднимаем наверх
+        
+        elif event.type == pygame.MOUSEBUTTONUP and self.game_state == "game":
+            card = self.dragged_card
+            self.dragged_card = None
+            if card:
+                # Карта, брошенная на такую же, ложится в ее стопку
+                stack = self.stack_under(card, event.pos)
+                if stack:
+                    self.merge_card(stack, card)
+                elif self.journal:
+                    # Сохраняем только итоговое место карты
+                    self.journal.card_moved(card)
+        
+        elif event.type == pygame.MOUSEMOTION and self.game_state == "game":
+            if self.dragged_card:
+                new_x = event.pos[0] - self.drag_offset[0]
+                new_y = event.pos[1] - self.drag_offset[1]
                 
-                elif event.type == pygame.MOUSEBUTTONUP and self.game_state == "game":
-                    dragged_card = None
+                # Границы игрового поля (без панели)
+                new_x = max(10, min(new_x, SCREEN_WIDTH - PANEL_WIDTH - CARD_WIDTH - 10))
+                new_y = max(70, min(new_y, SCREEN_HEIGHT - CARD_HEIGHT - 110))
                 
-                elif event.type == pygame.MOUSEMOTION and self.game_state == "game":
-                    if dragged_card:
-                        new_x = mouse_pos[0] - drag_offset[0]
-                        new_y = mouse_pos[1] - drag_offset[1]
-                        
-                        # Границы игрового поля (без панели)
-                        new_x = max(10, min(new_x, SCREEN_WIDTH - PANEL_WIDTH - CARD_WIDTH - 10))
-                        new_y = max(70, min(new_y, SCREEN_HEIGHT - CARD_HEIGHT - 110))
-                        
-                        dragged_card.x = new_x
-                        dragged_card.y = new_y
-            
-            # Отрисовка
+                self.dragged_card.x = new_x
+                self.dragged_card.y = new_y
+                self.card_grid.move(self.dragged_card)
+    
+    def draw_frame(self):
+        profiler = self.profiler if self.profiler.enabled else None
+        if self.renderer:
+            rects = self.renderer.render()
+            if profiler and profiler.overlay:
+                rects.append(profiler.draw(self.screen, self.small_font))
+                profiler.mark("overlay")
+            pygame.display.update(rects)
+        else:
             if self.game_state == "menu":
                 self.draw_menu()
             elif self.game_state == "game":
@@ -595,11 +840,128 @@ class CultGame:
             elif self.game_state == "ending":
                 self.draw_ending()
             
+            if profiler:
+                if self.game_state != "game":
+                    profiler.mark("screen")
+                if profiler.overlay:
+                    profiler.draw(self.screen, self.small_font)
+                    profiler.mark("overlay")
             pygame.display.flip()
-            self.clock.tick(FPS)
-        
+        if profiler:
+            profiler.mark("flip")
+    
+    def run(self, recorder=None, replay=None, fast=False, draw=True, idle=IDLE_WAIT):
+        """Главный цикл. recorder пишет ввод в файл, replay подает записанный ввод вместо настоящего.
+        fast - без ограничения FPS, кадры без ввода при воспроизведении пропускаются.
+        idle - в простое ждать ввода и не перерисовывать кадр (кроме воспроизведения)"""
+        self.running = True
+        self.dragged_card = None
+        self.drag_offset = (0, 0)
+        self.frame = 0
+        
+        # Состояние меняется только от ввода, поэтому без ввода кадр не перерисовываем.
+        # Полная частота - при перетаскивании и еще ACTIVE_FRAMES кадров после ввода,
+        # чтобы движение мыши и смена подсветки шли плавно
+        idle = idle and not replay and not fast
+        redraw = True
+        active = 0
+        
+        while self.running:
+            profiler = self.profiler if self.profiler.enabled else None
+            if profiler:
+                profiler.begin_frame()
+            
+            if replay:
+                if replay.finished:
+                    break
+                if fast:
+                    self.frame = max(self.frame, replay.next_frame())
+                events = replay.events_at(self.frame)
+                # Окно при воспроизведении можно только закрыть
+                events += [event for event in pygame.event.get() if event.type == pygame.QUIT]
+            elif idle and not (redraw or active or self.dragged_card or self.profiler.overlay):
+                # Простой: спим до ввода. Номер кадра при этом не растет, поэтому
+                # запись партии воспроизводится без пауз простоя
+                event = pygame.event.wait(IDLE_TIMEOUT)
+                events = pygame.event.get()
+                if event.type != pygame.NOEVENT:
+                    events.insert(0, event)
+                if profiler:
+                    profiler.mark("wait")
+            else:
+                events = pygame.event.get()
+            
+            frame_start = time.perf_counter()
+            if events:
+                redraw = True
+                active = ACTIVE_FRAMES
+                events = coalesce_motion(events)
+            
+            # Обновление hover для кнопок
+            mouse_pos = pygame.mouse.get_pos()
+            for btn in self.buttons:
+                btn.update_hover(mouse_pos)
+            
+            state = self.game_state
+            for event in events:
+                if recorder:
+                    recorder.record(self.frame, event, self.dragged_card is not None)
+                self.handle_event(event)
+            if self.game_state == "ending" and state != "ending":
+                self.metrics.endings.inc((self.current_ending,))
+            if profiler:
+                profiler.mark("events")
+            
+            # Отрисовка
+            if draw and (redraw or not idle or self.profiler.overlay):
+                self.draw_frame()
+                redraw = False
+            if not fast and (not idle or active or self.dragged_card or self.profiler.overlay):
+                # Работа кадра без ожидания ввода и без самого tick
+                self.metrics.frame(time.perf_counter() - frame_start, 1 / FPS)
+                self.clock.tick(FPS)
+                self.metrics.fps.set(self.clock.get_fps())
+            if profiler:
+                profiler.mark("wait")
+            active = max(0, active - 1)
+            self.frame += 1
+        
+        if self.journal:
+            self.journal.close()
+        self.history.close()
         pygame.quit()
 
+def main():
+    parser = argparse.ArgumentParser(description="Тайный Культ")
+    parser.add_argument("--seed", type=int, default=None, help="seed случайности партии")
+    parser.add_argument("--record", metavar="FILE", help="записать партию для cult_replay.py")
+    parser.add_argument("--profile", metavar="FILE", help="записать время фаз всех кадров (.jsonl или .json для Chrome trace)")
+    parser.add_argument("--metrics", metavar="FILE", help="выгружать метрики в FILE (Prometheus) и FILE.jsonl")
+    args = parser.parse_args()
+    
+    if args.record:
+        # Запись всегда начинается с новой партии с известным seed
+        seed = args.seed if args.seed is not None else random.randrange(2 ** 32)
+        recorder = SessionRecorder(args.record, seed)
+        game = CultGame(seed=seed, save_path=None)
+        if args.profile:
+            game.profiler.start_capture()
+        exporter = MetricsExporter(game.metrics.registry, args.metrics).start() if args.metrics else None
+        game.run(recorder=recorder)
+        recorder.close(game)
+    else:
+        game = CultGame(seed=args.seed)
+        if args.profile:
+            game.profiler.start_capture()
+        exporter = MetricsExporter(game.metrics.registry, args.metrics).start() if args.metrics else None
+        game.run()
+    
+    if exporter:
+        exporter.stop()
+    
+    if args.profile:
+        game.profiler.export(args.profile)
+
 # Запуск игры
-game = CultGame()
-game.run()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,89 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cult_log import EventLog
+
+# Журнал событий cult_log: кольцевой буфер, сжатые файлы и чтение страниц.
+#
+# Запуск:  python -m pytest tests
+
+def texts(count, first=0):
+    return [f"запись {i}" for i in range(first, first + count)]
+
+def files(directory):
+    return sorted(name for name in os.listdir(directory) if name.endswith('.jsonl.gz'))
+
+def test_memory_only():
+    log = EventLog(None, recent=10, batch=4)
+    log.extend(texts(25))
+    assert len(log) == 25
+    assert log.start() == 15
+    assert log.page(0, 30) == texts(10, 15)
+    assert [entry[0] for entry in log.entries(20, 3)] == texts(3, 20)
+
+def test_paging_from_disk(tmp_path):
+    log = EventLog(str(tmp_path), recent=8, batch=4, file_size=1)
+    log.extend(texts(40))
+    assert log.start() == 0
+    # Страница целиком на диске, на границе диска и памяти и целиком в памяти
+    assert log.page(5, 6) == texts(6, 5)
+    assert log.page(28, 8) == texts(8, 28)
+    assert log.page(36, 10) == texts(4, 36)
+    assert [entry[0] for entry in log.entries(3, 4)] == texts(4, 3)
+    assert [entry[0] for entry in log.entries(34, 4)] == texts(4, 34)
+
+def test_entries_before_start_is_full_page(tmp_path):
+    log = EventLog(str(tmp_path), recent=8, batch=4, file_size=1, files=3)
+    log.extend(texts(40))
+    start = log.start()
+    assert start > 0
+    assert [entry[0] for entry in log.entries(start - 2, 4)] == texts(4, start)
+    memory = EventLog(None, recent=8, batch=4)
+    memory.extend(texts(20))
+    assert [entry[0] for entry in memory.entries(memory.start() - 2, 4)] == texts(4, 12)
+
+def test_rotation_removes_old_files(tmp_path):
+    log = EventLog(str(tmp_path), recent=8, batch=4, file_size=1, files=3)
+    log.extend(texts(40))
+    assert len(files(tmp_path)) == 3
+    # В каждом файле одна пачка: остались последние три
+    assert log.start() == 28
+    assert log.page(0, 40) == texts(12, 28)
+
+def test_reopen_continues_numbering(tmp_path):
+    log = EventLog(str(tmp_path), recent=8, batch=4)
+    log.extend(texts(10))
+    log.close()
+    
+    log = EventLog(str(tmp_path), recent=8, batch=4)
+    assert len(log) == 10
+    log.extend(texts(6, 10))
+    log.close()
+    
+    log = EventLog(str(tmp_path), recent=8, batch=4)
+    assert len(log) == 16
+    assert log.page(0, 16) == texts(16)
+
+def test_torn_batch_recovery(tmp_path):
+    log = EventLog(str(tmp_path), recent=8, batch=4)
+    log.extend(texts(4))
+    path = os.path.join(tmp_path, files(tmp_path)[-1])
+    size = os.path.getsize(path)
+    log.extend(texts(4, 4))
+    # Программа упала во время записи второй пачки: от нее остался только заголовок gzip
+    with open(path, 'r+b') as f:
+        f.truncate(size + 10)
+    
+    log = EventLog(str(tmp_path), recent=8, batch=4)
+    assert len(log) == 4
+    assert log.page(0, 10) == texts(4)
+    # Новые записи идут в новый файл: за недописанной пачкой их нельзя было бы прочитать
+    log.extend(texts(4, 100))
+    log.close()
+    assert len(files(tmp_path)) == 2
+    
+    log = EventLog(str(tmp_path), recent=8, batch=4)
+    assert len(log) == 8
+    assert log.page(0, 10) == texts(4) + texts(4, 100)
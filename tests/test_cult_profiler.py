@@ -0,0 +1,33 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cult_profiler import FrameProfiler
+
+# Профайлер кадра cult_profiler: кольцевые буферы и запись всех кадров.
+#
+# Запуск:  python -m pytest tests
+
+def run_frames(profiler, count):
+    for _ in range(count):
+        profiler.begin_frame()
+        profiler.mark("events")
+        profiler.mark("cards")
+
+def test_ring_keeps_last_frames():
+    profiler = FrameProfiler(size=8)
+    profiler.enable(True)
+    run_frames(profiler, 19)
+    frames = [frame for frame, start, phases in profiler.frame_records()]
+    assert frames == list(range(12, 20))
+
+def test_capture_keeps_every_frame():
+    profiler = FrameProfiler(size=8)
+    profiler.start_capture()
+    run_frames(profiler, 29)
+    records = list(profiler.frame_records())
+    assert [frame for frame, start, phases in records] == list(range(30))
+    starts = [start for frame, start, phases in records]
+    assert starts == sorted(starts)
+    assert all(set(phases) == {"events", "cards"} for frame, start, phases in records[1:])
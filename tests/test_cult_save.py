@@ -0,0 +1,91 @@
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from cult_rules import CultRules
+from cult_save import CARD_MOVE, EVENT_CARD_MOVE, RECORD, GameJournal, SaveError
+
+# Сохранение и журнал событий cult_save на правилах без окна.
+#
+# Запуск:  python -m pytest tests
+
+def state(game):
+    cards = sorted((card.uid, card.type, card.title, card.description, card.value, card.count, card.x, card.y)
+                   for card in game.cards)
+    return (game.health, game.reason, game.funds, game.game_state, game.current_ending, cards, list(game.log_entries))
+
+def new_game(path, seed=1, load=True):
+    """Игра с журналом в path: загружает сохранение или начинает новое"""
+    game = CultRules(random.Random(seed))
+    game.journal = journal = GameJournal(path)
+    if not (load and journal.load(game)):
+        journal.compact(game)
+    return game
+
+def play(game, turns):
+    for _ in range(turns):
+        if game.game_state != "game":
+            break
+        game.perform_action(game.rng.choice(game.available_actions()))
+
+def test_reload_matches(tmp_path):
+    path = str(tmp_path / "save.bin")
+    game = new_game(path, load=False)
+    play(game, 40)
+    game.journal.close()
+    
+    loaded = new_game(path)
+    assert state(loaded) == state(game)
+
+def test_torn_tail_then_append(tmp_path):
+    path = str(tmp_path / "save.bin")
+    game = new_game(path, load=False)
+    play(game, 20)
+    game.journal.close()
+    
+    # Игра упала посреди записи: последние байты журнала потеряны
+    with open(path + '.journal', 'r+b') as f:
+        f.truncate(os.path.getsize(path + '.journal') - 3)
+    
+    game = new_game(path)
+    play(game, 3)
+    game.journal.close()
+    
+    reloaded = new_game(path)
+    assert state(reloaded) == state(game)
+
+def test_unknown_card_is_save_error(tmp_path):
+    path = str(tmp_path / "save.bin")
+    game = new_game(path, load=False)
+    game.journal.close()
+    
+    # Запись о карте, которой нет в снимке
+    with open(path + '.journal', 'ab') as f:
+        f.write(RECORD.pack(EVENT_CARD_MOVE, CARD_MOVE.size) + CARD_MOVE.pack(999, 0, 0, 0, 0))
+    
+    with pytest.raises(SaveError):
+        GameJournal(path).load(CultRules(random.Random(1)))
+
+def test_split_then_reload(tmp_path):
+    path = str(tmp_path / "save.bin")
+    game = new_game(path, load=False)
+    stack = game.create_card("Сочувствующий", "Интересуется оккультизмом", 'follower')
+    game.create_card("Сочувствующий", "Интересуется оккультизмом", 'follower')
+    assert stack.count == 2
+    # Снятие карты со стопки (перетаскивание) пишется между действиями
+    game.split_card(stack)
+    game.journal.close()
+    
+    game = new_game(path)
+    card = game.create_card("Заброшенный храм", "Место, полное тайн", 'location')
+    uids = [card.uid for card in game.cards]
+    assert len(uids) == len(set(uids))
+    assert card.order == max(card.order for card in game.cards)
+    game.journal.close()
+    
+    reloaded = new_game(path)
+    assert state(reloaded) == state(game)
@@ -0,0 +1,153 @@
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+import cult_server
+from cult_server import GameServer, RequestError
+
+# Сервер партий cult_server: сессии, выгрузка на диск и обработка запросов.
+#
+# Запуск:  python -m pytest tests
+
+def evict_all(server):
+    asyncio.run(server.evict(time.monotonic() + 1))
+
+def test_evicted_session_reloads(tmp_path):
+    server = GameServer(str(tmp_path))
+    session = server.open_session(seed=5)
+    state = session.full_state()
+    evict_all(server)
+    assert session.id not in server.sessions
+    assert server.open_session(session.id).full_state() == state
+
+@pytest.mark.parametrize("damage", [
+    lambda data: b'XXXXXXXX' + data[8:],  # чужой заголовок
+    lambda data: data[:-7],  # обрезанный снимок
+    lambda data: data[:20],  # обрезанное состояние генератора
+])
+def test_corrupt_session_is_request_error(tmp_path, damage):
+    server = GameServer(str(tmp_path))
+    session = server.open_session(seed=5)
+    evict_all(server)
+    path = server.session_path(session.id)
+    with open(path, 'rb') as f:
+        data = f.read()
+    with open(path, 'wb') as f:
+        f.write(damage(data))
+    
+    with pytest.raises(RequestError, match="повреждена"):
+        server.open_session(session.id)
+
+def test_seed_out_of_range(tmp_path):
+    server = GameServer(str(tmp_path))
+    for seed in (2 ** 63, -2 ** 63 - 1, 2 ** 70, "5", 1.5):
+        with pytest.raises(RequestError):
+            server.open_session(seed=seed)
+    assert server.open_session(seed=2 ** 63 - 1).seed == 2 ** 63 - 1
+
+def test_encode_failure_keeps_session(tmp_path, monkeypatch):
+    server = GameServer(str(tmp_path))
+    broken = server.open_session(seed=1)
+    other = server.open_session(seed=2)
+    encode = cult_server.encode_session
+    
+    def encode_session(session):
+        if session is broken:
+            raise ValueError("encode")
+        return encode(session)
+    monkeypatch.setattr(cult_server, "encode_session", encode_session)
+    
+    evict_all(server)
+    assert broken.id in server.sessions
+    assert other.id not in server.sessions
+    assert os.path.exists(server.session_path(other.id))
+    assert "error" not in server.handle_request({"op": "action", "session": broken.id, "action": "Отдых"})
+
+def test_write_failure_keeps_session(tmp_path):
+    server = GameServer(str(tmp_path))
+    session = server.open_session(seed=1)
+    server.state_dir = str(tmp_path / "missing")
+    evict_all(server)
+    assert server.sessions[session.id] is session
+    assert not server.evicting
+
+def test_sweeper_survives_errors(tmp_path, monkeypatch):
+    server = GameServer(str(tmp_path), sweep_interval=0)
+    calls = []
+    
+    async def evict(before):
+        calls.append(before)
+        if len(calls) < 3:
+            raise OSError("disk")
+    monkeypatch.setattr(server, "evict", evict)
+    
+    async def run():
+        sweeper = asyncio.create_task(server.evict_idle())
+        while len(calls) < 3:
+            await asyncio.sleep(0)
+        sweeper.cancel()
+    asyncio.run(run())
+    assert len(calls) >= 3
+
+def test_close_during_eviction(tmp_path, monkeypatch):
+    server = GameServer(str(tmp_path))
+    session = server.open_session(seed=1)
+    writing = threading.Event()
+    release = threading.Event()
+    write_sessions = server.write_sessions
+    
+    def slow_write(batch):
+        writing.set()
+        release.wait()
+        return write_sessions(batch)
+    monkeypatch.setattr(server, "write_sessions", slow_write)
+    
+    async def run():
+        eviction = asyncio.create_task(server.evict(time.monotonic() + 1))
+        while not writing.is_set():
+            await asyncio.sleep(0.001)
+        server.close_session(session.id)
+        release.set()
+        await eviction
+    asyncio.run(run())
+    
+    assert not os.path.exists(server.session_path(session.id))
+    with pytest.raises(RequestError, match="Нет такой сессии"):
+        server.open_session(session.id)
+
+def exchange(server, lines):
+    """Отправляет строки одним соединением и возвращает ответы"""
+    async def run():
+        listener = await asyncio.start_server(server.handle_connection, "127.0.0.1", 0)
+        reader, writer = await asyncio.open_connection("127.0.0.1", listener.sockets[0].getsockname()[1])
+        replies = []
+        for line in lines:
+            writer.write(line + b"\n")
+            replies.append(json.loads(await reader.readline()))
+        writer.close()
+        listener.close()
+        return replies
+    return asyncio.run(run())
+
+def test_bad_requests_keep_connection(tmp_path, monkeypatch):
+    server = GameServer(str(tmp_path))
+    handle_request = server.handle_request
+    
+    def failing(request):
+        if request.get("op") == "boom":
+            raise ZeroDivisionError
+        return handle_request(request)
+    monkeypatch.setattr(server, "handle_request", failing)
+    
+    replies = exchange(server, [b'5', b'[1, 2]', b'"open"', b'{not json', b'{"op": "boom", "id": 7}',
+                                b'{"op": "open", "seed": 1, "id": 8}'])
+    assert all("error" in reply for reply in replies[:5])
+    assert replies[4]["id"] == 7
+    assert replies[5]["id"] == 8 and "session" in replies[5]